@@ -27,6 +27,18 @@ if config.config_file_name is not None:
 target_metadata = Base.metadata
 
 
+def include_object(object, name, type_, reflected, compare_to):
+    # viewها (مثل monthly_charity_financials) با migration دستی ساخته می‌شوند
+    if type_ == "table" and object.info.get("is_view"):
+        return False
+    # اشیای مخصوص PostgreSQL که فقط در migration ساخته می‌شوند (مثل need_ads.search_tsv)
+    if type_ in ("column", "index") and reflected and compare_to is None:
+        table = target_metadata.tables.get(object.table.name)
+        if table is not None and name in table.info.get("db_only_objects", ()):
+            return False
+    return True
+
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -51,6 +63,7 @@ def run_migrations_offline() -> None:
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        include_object=include_object,
     )
 
     with context.begin_transaction():
@@ -72,7 +85,8 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection, target_metadata=target_metadata,
+            include_object=include_object,
         )
 
         with context.begin_transaction():
@@ -0,0 +1,68 @@
+"""full-text and trigram search indexes on need_ads
+
+Revision ID: a7d3e9c4b218
+Revises: f1c7d93a5e62
+Create Date: 2026-10-17 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7d3e9c4b218'
+down_revision: Union[str, Sequence[str], None] = 'f1c7d93a5e62'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SEARCH_EXPRESSION = (
+    "to_tsvector('simple', coalesce(title, '') || ' ' || "
+    "coalesce(short_description, '') || ' ' || coalesce(description, ''))"
+)
+TRGM_COLUMNS = ['city', 'province']
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # tsvector، pg_trgm و ایندکس‌های GIN فقط در PostgreSQL؛ در بقیه دیتابیس‌ها جستجو با ILIKE است
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.add_column(
+        'need_ads',
+        sa.Column(
+            'search_tsv', postgresql.TSVECTOR(),
+            sa.Computed(SEARCH_EXPRESSION, persisted=True),
+        ),
+    )
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_need_ads_search_tsv', 'need_ads', ['search_tsv'], unique=False,
+            postgresql_using='gin',
+            postgresql_concurrently=True,
+        )
+        # فیلتر شهر/استان همچنان ILIKE '%...%' است
+        for column in TRGM_COLUMNS:
+            op.create_index(
+                f'ix_need_ads_{column}_trgm', 'need_ads', [column], unique=False,
+                postgresql_using='gin',
+                postgresql_ops={column: 'gin_trgm_ops'},
+                postgresql_concurrently=True,
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    with op.get_context().autocommit_block():
+        for column in TRGM_COLUMNS:
+            op.drop_index(
+                f'ix_need_ads_{column}_trgm', table_name='need_ads', postgresql_concurrently=True
+            )
+        op.drop_index('ix_need_ads_search_tsv', table_name='need_ads', postgresql_concurrently=True)
+    op.drop_column('need_ads', 'search_tsv')
@@ -0,0 +1,67 @@
+"""monthly charity financials rollup
+
+Revision ID: b7c41e2d9a10
+Revises: 621661665bbf
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7c41e2d9a10'
+down_revision: Union[str, Sequence[str], None] = '621661665bbf'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # نمای مادی‌شده فقط در PostgreSQL؛ روی SQLite گزارش‌ها مستقیم از جدول‌ها محاسبه می‌شوند
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    # جمع ماهانه کمک‌ها، سهم فروش و پرداخت به نیازمندان برای هر خیریه؛ هر شب refresh می‌شود
+    op.execute("""
+        CREATE MATERIALIZED VIEW monthly_charity_financials AS
+        SELECT
+            charity_id,
+            month,
+            SUM(donations) AS donations,
+            SUM(donation_count) AS donation_count,
+            SUM(sales) AS sales,
+            SUM(order_count) AS order_count,
+            SUM(expenses) AS expenses,
+            SUM(completed_needs) AS completed_needs
+        FROM (
+            SELECT charity_id, date_trunc('month', created_at) AS month,
+                   amount AS donations, 1 AS donation_count,
+                   0 AS sales, 0 AS order_count, 0 AS expenses, 0 AS completed_needs
+            FROM donations
+            WHERE status = 'completed'
+            UNION ALL
+            SELECT charity_id, date_trunc('month', created_at),
+                   0, 0, COALESCE(charity_amount, 0), 1, 0, 0
+            FROM orders
+            WHERE status IN ('delivered', 'confirmed')
+            UNION ALL
+            SELECT charity_id, date_trunc('month', updated_at),
+                   0, 0, 0, 0, COALESCE(collected_amount, 0), 1
+            FROM need_ads
+            WHERE status = 'completed'
+        ) AS src
+        GROUP BY charity_id, month
+    """)
+    # ایندکس یکتا برای REFRESH MATERIALIZED VIEW CONCURRENTLY و جستجوی خیریه/ماه
+    op.execute(
+        "CREATE UNIQUE INDEX ux_monthly_charity_financials_charity_month "
+        "ON monthly_charity_financials (charity_id, month)"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("DROP MATERIALIZED VIEW IF EXISTS monthly_charity_financials")
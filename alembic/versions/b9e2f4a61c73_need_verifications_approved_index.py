@@ -0,0 +1,46 @@
+"""partial index on approved need verifications
+
+Revision ID: b9e2f4a61c73
+Revises: a7d3e9c4b218
+Create Date: 2026-10-17 17:30:00.000000
+
+"""
+from contextlib import nullcontext
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b9e2f4a61c73'
+down_revision: Union[str, Sequence[str], None] = 'a7d3e9c4b218'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEX_NAME = 'ix_need_verifications_approved'
+
+
+def _concurrent_block():
+    # CONCURRENTLY فقط در PostgreSQL و بیرون از تراکنش؛ در بقیه دیتابیس‌ها ایندکس ساده ساخته می‌شود
+    if op.get_bind().dialect.name == "postgresql":
+        return op.get_context().autocommit_block()
+    return nullcontext()
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # برچسب enum در پایگاه داده نام عضو (APPROVED) است، نه مقدار آن
+    with _concurrent_block():
+        op.create_index(
+            INDEX_NAME, 'need_verifications', ['need_id'], unique=False,
+            postgresql_where=sa.text("status = 'APPROVED'"),
+            sqlite_where=sa.text("status = 'APPROVED'"),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with _concurrent_block():
+        op.drop_index(INDEX_NAME, table_name='need_verifications', postgresql_concurrently=True)
@@ -0,0 +1,54 @@
+"""financial report indexes
+
+Revision ID: c3f8a9d27e45
+Revises: b7c41e2d9a10
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+from contextlib import nullcontext
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3f8a9d27e45'
+down_revision: Union[str, Sequence[str], None] = 'b7c41e2d9a10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (نام ایندکس، جدول، ستون‌ها، ستون‌های INCLUDE برای index-only scan)
+INDEXES = [
+    ('ix_donations_charity_status_created', 'donations',
+     ['charity_id', 'status', 'created_at'], ['amount']),
+    ('ix_orders_charity_status_created', 'orders',
+     ['charity_id', 'status', 'created_at'], ['charity_amount', 'grand_total']),
+    ('ix_need_ads_charity_status_updated', 'need_ads',
+     ['charity_id', 'status', 'updated_at'], ['collected_amount', 'target_amount']),
+]
+
+
+def _concurrent_block():
+    # CONCURRENTLY فقط در PostgreSQL و بیرون از تراکنش؛ در بقیه دیتابیس‌ها ایندکس ساده ساخته می‌شود
+    if op.get_bind().dialect.name == "postgresql":
+        return op.get_context().autocommit_block()
+    return nullcontext()
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY بیرون از تراکنش اجرا می‌شود تا نوشتن روی جدول‌ها قفل نشود
+    with _concurrent_block():
+        for name, table, columns, include in INDEXES:
+            op.create_index(
+                name, table, columns, unique=False,
+                postgresql_include=include,
+                postgresql_concurrently=True,
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with _concurrent_block():
+        for name, table, _, _ in INDEXES:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
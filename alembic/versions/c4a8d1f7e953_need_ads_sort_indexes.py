@@ -0,0 +1,47 @@
+"""status-prefixed sort indexes on need_ads
+
+Revision ID: c4a8d1f7e953
+Revises: b9e2f4a61c73
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+from contextlib import nullcontext
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4a8d1f7e953'
+down_revision: Union[str, Sequence[str], None] = 'b9e2f4a61c73'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# ستون‌های مجاز برای مرتب‌سازی لیست نیازها
+SORT_COLUMNS = ['created_at', 'target_amount', 'collected_amount', 'deadline']
+
+
+def _concurrent_block():
+    # CONCURRENTLY فقط در PostgreSQL و بیرون از تراکنش؛ در بقیه دیتابیس‌ها ایندکس ساده ساخته می‌شود
+    if op.get_bind().dialect.name == "postgresql":
+        return op.get_context().autocommit_block()
+    return nullcontext()
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with _concurrent_block():
+        for column in SORT_COLUMNS:
+            op.create_index(
+                f'ix_need_ads_status_{column}', 'need_ads', ['status', column], unique=False,
+                postgresql_concurrently=True,
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with _concurrent_block():
+        for column in SORT_COLUMNS:
+            op.drop_index(
+                f'ix_need_ads_status_{column}', table_name='need_ads', postgresql_concurrently=True
+            )
@@ -0,0 +1,126 @@
+"""cached donation and sales totals on charities
+
+Revision ID: e8b14c6f2d37
+Revises: d5a2e7b0c981
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8b14c6f2d37'
+down_revision: Union[str, Sequence[str], None] = 'd5a2e7b0c981'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (ستون charities، جدول منبع، ستون مبلغ، شرط پرداخت‌شده بودن سطر که با OLD./NEW. هم به کار می‌رود)
+SOURCES = [
+    ('total_donations_cached', 'donations', 'amount', "status = 'completed'"),
+    ('total_sales_cached', 'orders', 'charity_amount', "status IN ('delivered', 'confirmed')"),
+]
+
+TRIGGER_FUNCTION = """
+    CREATE OR REPLACE FUNCTION {table}_track_charity_total() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP <> 'INSERT' THEN
+            IF OLD.{condition} THEN
+                UPDATE charities SET {column} = {column} - COALESCE(OLD.{amount}, 0)
+                WHERE id = OLD.charity_id;
+            END IF;
+        END IF;
+        IF TG_OP <> 'DELETE' THEN
+            IF NEW.{condition} THEN
+                UPDATE charities SET {column} = {column} + COALESCE(NEW.{amount}, 0)
+                WHERE id = NEW.charity_id;
+            END IF;
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+"""
+
+# معادل SQLite: تابع تریگر ندارد، برای هر رویداد یک تریگر جدا با بدنه SQL
+SQLITE_SUBTRACT_OLD = """
+        UPDATE charities SET {column} = {column} - COALESCE(OLD.{amount}, 0)
+        WHERE id = OLD.charity_id AND OLD.{condition};"""
+SQLITE_ADD_NEW = """
+        UPDATE charities SET {column} = {column} + COALESCE(NEW.{amount}, 0)
+        WHERE id = NEW.charity_id AND NEW.{condition};"""
+SQLITE_TRIGGERS = [
+    ('insert', 'INSERT', [SQLITE_ADD_NEW]),
+    ('update', 'UPDATE OF status, {amount}, charity_id', [SQLITE_SUBTRACT_OLD, SQLITE_ADD_NEW]),
+    ('delete', 'DELETE', [SQLITE_SUBTRACT_OLD]),
+]
+
+
+def _is_postgresql() -> bool:
+    return op.get_bind().dialect.name == "postgresql"
+
+
+def _create_triggers(table, column, amount, condition) -> None:
+    params = dict(table=table, column=column, amount=amount, condition=condition)
+    if _is_postgresql():
+        op.execute(TRIGGER_FUNCTION.format(**params))
+        op.execute(f"""
+            CREATE TRIGGER {table}_charity_total
+            AFTER INSERT OR UPDATE OF status, {amount}, charity_id OR DELETE ON {table}
+            FOR EACH ROW EXECUTE FUNCTION {table}_track_charity_total()
+        """)
+        return
+    for suffix, event, statements in SQLITE_TRIGGERS:
+        body = "".join(statement.format(**params) for statement in statements)
+        op.execute(f"""
+            CREATE TRIGGER {table}_charity_total_{suffix}
+            AFTER {event.format(**params)} ON {table}
+            FOR EACH ROW BEGIN{body}
+            END
+        """)
+
+
+def _drop_triggers(table) -> None:
+    if _is_postgresql():
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_charity_total ON {table}")
+        op.execute(f"DROP FUNCTION IF EXISTS {table}_track_charity_total()")
+        return
+    for suffix, _, _ in SQLITE_TRIGGERS:
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_charity_total_{suffix}")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for column, _, _, _ in SOURCES:
+        op.add_column(
+            'charities',
+            sa.Column(column, sa.Float(), nullable=False, server_default='0'),
+        )
+
+    for column, table, amount, condition in SOURCES:
+        # مقدار اولیه از داده‌های موجود؛ از این به بعد تریگر جمع را به‌روز نگه می‌دارد
+        op.execute(f"""
+            UPDATE charities SET {column} = COALESCE((
+                SELECT SUM(COALESCE({amount}, 0))
+                FROM {table}
+                WHERE {table}.charity_id = charities.id AND {condition}
+            ), 0)
+        """)
+        _create_triggers(table, column, amount, condition)
+
+    # رتبه‌بندی خیریه‌های برتر گزارش عمومی با مرتب‌سازی روی ایندکس
+    op.execute(
+        "CREATE INDEX ix_charities_rank ON charities "
+        "((total_donations_cached + total_sales_cached) DESC) WHERE active"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP INDEX IF EXISTS ix_charities_rank")
+    for column, table, _, _ in SOURCES:
+        _drop_triggers(table)
+        # SQLite حذف ستون را فقط در حالت batch پشتیبانی می‌کند
+        with op.batch_alter_table('charities') as batch_op:
+            batch_op.drop_column(column)
@@ -0,0 +1,48 @@
+"""partial index for need-linked orders in impact reports
+
+Revision ID: f1c7d93a5e62
+Revises: e8b14c6f2d37
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+from contextlib import nullcontext
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1c7d93a5e62'
+down_revision: Union[str, Sequence[str], None] = 'e8b14c6f2d37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEX_NAME = 'ix_orders_need_report'
+WHERE = "need_id IS NOT NULL AND status IN ('delivered', 'confirmed', 'shipped')"
+
+
+def _concurrent_block():
+    # CONCURRENTLY فقط در PostgreSQL و بیرون از تراکنش؛ در بقیه دیتابیس‌ها ایندکس ساده ساخته می‌شود
+    if op.get_bind().dialect.name == "postgresql":
+        return op.get_context().autocommit_block()
+    return nullcontext()
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # فقط سفارش‌های مرتبط با نیاز که در گزارش تأثیر حساب می‌شوند
+    with _concurrent_block():
+        op.create_index(
+            INDEX_NAME, 'orders', ['charity_id', 'created_at'], unique=False,
+            postgresql_include=['need_id', 'grand_total', 'charity_amount'],
+            postgresql_where=sa.text(WHERE),
+            sqlite_where=sa.text(WHERE),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with _concurrent_block():
+        op.drop_index(INDEX_NAME, table_name='orders', postgresql_concurrently=True)
@@ -14,6 +14,8 @@ from models import Charity
 from models.user import User
 from models.donation import Donation
 from services.donation_service import DonationService
+from services.financial_report import FinancialReportService
+from services.need_service import NeedService
 from schemas.donation import (
     DonationCreate, DonationUpdate, DonationStatusUpdate, DonationRead, DonationDetail,
     DonationFilter, PaymentInitiate, PaymentVerify, DirectTransferCreate,
@@ -319,6 +321,7 @@ async def verify_direct_transfer(
         # به‌روزرسانی مبلغ جمع‌آوری شده نیاز
         if donation.need:
             donation.need.collected_amount = (donation.need.collected_amount or 0) + donation.amount
+            await NeedService(db).refresh_trust_score(donation.need)
             db.add(donation.need)
     else:
         donation.status = "failed"
@@ -332,6 +335,7 @@ async def verify_direct_transfer(
 
     db.add(donation)
     await db.commit()
+    await FinancialReportService.invalidate_cache()
 
     return {
         "donation_id": donation.id,
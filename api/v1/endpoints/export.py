@@ -1,5 +1,5 @@
 # app/api/v1/endpoints/export.py
-from fastapi import APIRouter, Depends, HTTPException, Query, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, Query, BackgroundTasks, Header
 from fastapi.responses import FileResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Dict, Any, Optional
@@ -9,7 +9,7 @@ import os
 from core.database import get_db
 from core.permissions import get_current_user, require_roles
 from models.user import User
-from services.export_service import ExportService
+from services.export_service import export_service
 from services.report_service import ReportService
 from schemas.export import ExportRequest, ExportTemplate, ExportFormat, ExportResult
 from schemas.report import ReportRequest, ReportFilter, ReportType, DateRange
@@ -27,7 +27,6 @@ async def export_report(
     """خروجی‌گیری از گزارش به صورت فایل (Excel, PDF, CSV)"""
 
     report_service = ReportService(db)
-    export_service = ExportService()
 
     report_type = None
     filters = ReportFilter()
@@ -66,6 +65,7 @@ async def export_report(
 @router.get("/download/{filename}")
 async def download_export(
         filename: str,
+        accept_encoding: Optional[str] = Header(None),
         current_user: User = Depends(get_current_user)
 ):
     """دانلود فایل خروجی"""
@@ -74,10 +74,21 @@ async def download_export(
     if not os.path.exists(filepath):
         raise HTTPException(status_code=404, detail="File not found")
 
+    # فایل‌های gzip شده (CSV/JSON) در صورت پشتیبانی کلاینت با Content-Encoding ارسال می‌شوند
+    if filename.endswith(".gz") and accept_encoding and "gzip" in accept_encoding:
+        return FileResponse(
+            path=filepath,
+            filename=filename[:-3],
+            media_type="application/octet-stream",
+            headers={"Content-Encoding": "gzip", "Vary": "Accept-Encoding"}
+        )
+
+    # بدنه پاسخ به Accept-Encoding وابسته است؛ cache مشترک نباید نسخه‌ها را جابه‌جا بدهد
     return FileResponse(
         path=filepath,
         filename=filename,
-        media_type="application/octet-stream"
+        media_type="application/octet-stream",
+        headers={"Vary": "Accept-Encoding"}
     )
 
 
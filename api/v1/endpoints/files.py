@@ -96,6 +96,29 @@ async def upload_multiple_files(
     return uploaded_files
 
 
+def _file_response(service: FileService, file_attachment, content, media_type: str, filename: str):
+    """
+    فایل رمزنگاری‌نشده مستقیم از روی دیسک با FileResponse فرستاده می‌شود
+    (سرور ASGI در صورت پشتیبانی از sendfile استفاده می‌کند)؛ فقط فایل رمز شده از مسیر رمزگشایی جریانی می‌گذرد.
+    """
+    disposition = f"inline; filename=\"{filename}\""
+    if not file_attachment.is_encrypted:
+        return FileResponse(
+            file_attachment.storage_path,
+            media_type=media_type,
+            headers={"Content-Disposition": disposition}
+        )
+
+    return StreamingResponse(
+        content,
+        media_type=media_type,
+        headers={
+            "Content-Disposition": disposition,
+            "Content-Length": str(service.get_content_length(file_attachment))
+        }
+    )
+
+
 # ---------- دانلود فایل ----------
 @router.get("/download/{file_id}")
 async def download_file(
@@ -116,14 +139,7 @@ async def download_file(
     else:
         media_type = "application/octet-stream"
 
-    return StreamingResponse(
-        iter([content]),
-        media_type=media_type,
-        headers={
-            "Content-Disposition": f"inline; filename=\"{file_attachment.original_filename}\"",
-            "Content-Length": str(file_attachment.file_size)
-        }
-    )
+    return _file_response(service, file_attachment, content, media_type, file_attachment.original_filename)
 
 
 @router.get("/view/{file_id}")
@@ -144,14 +160,7 @@ async def view_file(
             detail="File cannot be viewed directly"
         )
 
-    return StreamingResponse(
-        iter([content]),
-        media_type=mime_type,
-        headers={
-            "Content-Disposition": f"inline; filename=\"{file_attachment.original_filename}\"",
-            "Content-Length": str(file_attachment.file_size)
-        }
-    )
+    return _file_response(service, file_attachment, content, mime_type, file_attachment.original_filename)
 
 
 # ---------- دریافت اطلاعات ----------
@@ -299,7 +308,6 @@ async def restore_file(
 
     file_attachment.is_active = True
     db.add(file_attachment)
-    await db.commit()
 
     await service._log_file_access(
         file_id,
@@ -307,6 +315,7 @@ async def restore_file(
         "restore",
         success=True
     )
+    await db.commit()
 
     return {"success": True, "message": "File restored successfully"}
 
@@ -434,10 +443,7 @@ async def get_file_thumbnail(
     # اینجا فایل اصلی را برمی‌گردانیم
     _, content = await service.download_file(file_id, current_user)
 
-    return StreamingResponse(
-        iter([content]),
-        media_type=file_attachment.mime_type,
-        headers={
-            "Content-Disposition": f"inline; filename=\"thumbnail_{file_attachment.original_filename}\""
-        }
+    return _file_response(
+        service, file_attachment, content, file_attachment.mime_type,
+        f"thumbnail_{file_attachment.original_filename}"
     )
\ No newline at end of file
@@ -1,6 +1,6 @@
 # app/api/v1/endpoints/impact_report.py - فایل جدید
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 from datetime import datetime, timedelta
@@ -28,7 +28,9 @@ async def get_product_impact_report(
     - هر نیاز چقدر از طریق فروش محصولات تأمین شده
     """
     service = ImpactReportService(db)
-    return await service.generate_impact_report(start_date, end_date, charity_id, need_id)
+    # JSON آماده سرویس (از کش) مستقیم ارسال می‌شود، بدون jsonable_encoder روی دیکشنری تو در تو
+    content = await service.generate_impact_report_json(start_date, end_date, charity_id, need_id)
+    return Response(content=content, media_type="application/json")
 
 
 @router.get("/charity/{charity_id}")
@@ -42,7 +44,8 @@ async def get_charity_impact_report(
     گزارش تأثیر خیریه - درصد تأمین نیازها از طریق فروش محصولات
     """
     service = ImpactReportService(db)
-    return await service.generate_charity_impact_report(charity_id, year)
+    content = await service.generate_charity_impact_report_json(charity_id, year)
+    return Response(content=content, media_type="application/json")
 
 
 @router.get("/top-products")
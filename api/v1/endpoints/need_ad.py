@@ -724,6 +724,20 @@ async def add_need_attachment(
     return await service.add_attachment_to_need(need_id, file, current_user, description)
 
 
+@router.post("/{need_id}/attachments/batch")
+async def add_need_attachments(
+    need_id: int,
+    files: List[UploadFile] = File(...),
+    description: Optional[str] = Form(None),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """آپلود چند فایل برای نیاز در یک تراکنش"""
+    from services.need_service import NeedService
+    service = NeedService(db)
+    return await service.add_attachments_to_need(need_id, files, current_user, description)
+
+
 @router.get("/stats", response_model=Dict[str, Any])
 async def get_needs_stats(
         db: AsyncSession = Depends(get_db),
@@ -1130,7 +1144,8 @@ async def get_need_trust_score(
     """دریافت امتیاز اعتماد و نشان آگهی"""
 
     service = NeedService(db)
-    trust_score = await service._calculate_trust_score(need_id)
+    need = await service._get_need(need_id)
+    trust_score = need.trust_score or 0.0
     verified_by_list = await service._get_verified_by_list(need_id)
 
     # تعیین سطح نشان
@@ -1171,8 +1186,7 @@ async def recalculate_trust_score(
     service = NeedService(db)
     need = await service._get_need(need_id)
 
-    trust_score = await service._calculate_trust_score(need_id)
-    need.trust_score = trust_score
+    trust_score = await service.refresh_trust_score(need)
 
     # به‌روزرسانی نشان
     if trust_score >= 80:
@@ -1,5 +1,5 @@
 # 3️⃣ app/api/v1/endpoints/need_emergency.py
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Dict, Any
 from datetime import datetime
@@ -21,6 +21,7 @@ router = APIRouter()
 async def declare_emergency(
         need_id: int,
         emergency_data: NeedEmergencyCreate,
+        background_tasks: BackgroundTasks,
         current_user: User = Depends(require_roles("ADMIN", "CHARITY_MANAGER")),
         db: AsyncSession = Depends(get_db)
 ):
@@ -35,7 +36,8 @@ async def declare_emergency(
     emergency = await service.create_emergency_need(
         need=need,
         emergency_data=emergency_data.dict(),
-        user=current_user
+        user=current_user,
+        background_tasks=background_tasks
     )
 
     return emergency
@@ -1,10 +1,23 @@
 import json
-from typing import Optional
+import time
+from typing import Dict, Optional, Tuple
 
-_cache = {}
+# کلید -> (مقدار، زمان انقضا)
+_cache: Dict[str, Tuple[str, float]] = {}
 
 async def get_cache(key: str) -> Optional[str]:
-    return _cache.get(key)
+    entry = _cache.get(key)
+    if entry is None:
+        return None
+    value, expires_at = entry
+    if expires_at <= time.monotonic():
+        _cache.pop(key, None)
+        return None
+    return value
 
 async def set_cache(key: str, value: str, ttl: int = 300):
-    _cache[key] = value
+    _cache[key] = (value, time.monotonic() + ttl)
+
+async def delete_cache_prefix(prefix: str):
+    for key in [key for key in _cache if key.startswith(prefix)]:
+        _cache.pop(key, None)
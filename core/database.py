@@ -3,14 +3,29 @@ from sqlalchemy.ext.asyncio import (
     AsyncSession,
     create_async_engine,
 )
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker
 
 from core.config import settings
 
+# ویژگی‌های مخصوص PostgreSQL (نمای تجمیعی، تریگرها، جستجوی تمام‌متن) فقط روی آن فعال می‌شوند؛
+# dev روی SQLite اجرا می‌شود
+IS_POSTGRESQL = make_url(settings.DATABASE_URL).get_backend_name() == "postgresql"
+
+_connect_args = {}
+if make_url(settings.DATABASE_URL).get_driver_name() == "asyncpg":
+    # کش prepared statement روی هر اتصال؛ کوئری‌های گزارش هم‌شکل فقط یک بار parse/plan می‌شوند
+    _connect_args = {
+        "prepared_statement_cache_size": 500,
+        "statement_cache_size": 500,
+    }
+
 engine = create_async_engine(
     settings.DATABASE_URL,
     echo=settings.DEBUG,      # فقط در dev
     future=True,
+    query_cache_size=1200,    # کش SQL کامپایل‌شده SQLAlchemy (پیش‌فرض ۵۰۰)
+    connect_args=_connect_args,
 )
 
 AsyncSessionLocal = sessionmaker(
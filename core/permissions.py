@@ -26,7 +26,10 @@ async def get_current_user(
             detail="Invalid or expired token",
         )
 
-    result = await db.execute(select(User).where(User.uuid == user_id))
+    # نقش‌ها همراه کاربر بارگذاری می‌شوند تا بررسی‌های بعدی بدون کوئری اضافه باشند
+    result = await db.execute(
+        select(User).options(selectinload(User.roles)).where(User.uuid == user_id)
+    )
     user = result.scalar_one_or_none()
 
     if not user or not user.is_active or user.deleted_at:
@@ -90,7 +93,7 @@ def require_permission(permission_code: str):
 # core/permissions.py
 def require_roles(*roles_allowed):
     def wrapper(user: User = Depends(get_current_active_user)):
-        user_roles = [role.key for role in user.roles]
+        user_roles = user.role_keys
         if not any(r in user_roles for r in roles_allowed):
             raise HTTPException(status_code=403, detail="Not authorized")
         return user
@@ -1,5 +1,5 @@
 # app/models/charity.py
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, func, ForeignKey, Float, JSON
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, func, ForeignKey, Float, JSON, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import UUID
 import uuid
@@ -22,6 +22,10 @@ class Charity(Base):
     verified = Column(Boolean, default=False)
     active = Column(Boolean, default=True)
 
+    # جمع کمک‌های تکمیل‌شده و سهم فروش‌های پرداخت‌شده؛ فقط تریگرهای دیتابیس آن‌ها را به‌روز می‌کنند
+    total_donations_cached = Column(Float, nullable=False, default=0.0, server_default="0")
+    total_sales_cached = Column(Float, nullable=False, default=0.0, server_default="0")
+
     # مدیر خیریه (User)
     manager_id = Column(Integer, ForeignKey("users.id"))
     manager = relationship(
@@ -33,6 +37,15 @@ class Charity(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
+    __table_args__ = (
+        # رتبه‌بندی خیریه‌های فعال بر اساس کل مبلغ دریافتی (خیریه‌های برتر گزارش عمومی)
+        Index(
+            "ix_charities_rank",
+            (total_donations_cached + total_sales_cached).desc(),
+            postgresql_where=active,
+        ),
+    )
+
     # Relationships
     needs = relationship("NeedAd", back_populates="charity")
     donations = relationship("Donation", back_populates="charity")
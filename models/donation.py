@@ -1,5 +1,5 @@
 # app/models/donation.py
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, func, ForeignKey, Float, Enum, JSON
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, func, ForeignKey, Float, Enum, JSON, Index
 from sqlalchemy.orm import relationship
 import uuid
 from models.base import Base
@@ -7,6 +7,14 @@ from models.base import Base
 
 class Donation(Base):
     __tablename__ = "donations"
+    __table_args__ = (
+        # جمع کمک‌های تکمیل‌شده هر خیریه در یک بازه زمانی (گزارش‌های مالی)
+        Index(
+            "ix_donations_charity_status_created",
+            "charity_id", "status", "created_at",
+            postgresql_include=["amount", "donor_id"],
+        ),
+    )
 
     id = Column(Integer, primary_key=True)
     uuid = Column(String(36), unique=True, nullable=False, default=lambda: str(uuid.uuid4()))
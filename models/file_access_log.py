@@ -9,6 +9,10 @@ from models import Base
 
 class FileAccessLog(Base):
     __tablename__ = "file_access_logs"
+    __table_args__ = (
+        # لاگ‌های یک فایل از جدید به قدیم (اسکن معکوس ایندکس)؛ صفحه‌بندی keyset روی (accessed_at, id)
+        Index("ix_file_access_logs_file_time", "file_id", "accessed_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True)
     file_id = Column(Integer, ForeignKey("file_attachments.id", ondelete="CASCADE"), nullable=False)
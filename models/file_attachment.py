@@ -1,6 +1,6 @@
 # models/file_attachment.py
 import enum
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, func, ForeignKey, Enum, JSON
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, func, ForeignKey, Enum, JSON, Index, text
 from sqlalchemy.orm import relationship
 import uuid
 from models.base import Base
@@ -22,6 +22,24 @@ class FileAccessLevel(str, enum.Enum):
 
 class FileAttachment(Base):
     __tablename__ = "file_attachments"
+    __table_args__ = (
+        # لیست فایل‌ها همیشه فایل‌های فعال را به ترتیب زمان آپلود می‌خواهد
+        Index(
+            "ix_file_attachments_active_uploaded_at",
+            "uploaded_at",
+            postgresql_where=text("is_active"),
+        ),
+        Index("ix_file_attachments_entity", "entity_type", "entity_id"),
+        # جستجوی ILIKE '%...%' روی نام فایل؛ نیازمند افزونه pg_trgm
+        Index(
+            "ix_file_attachments_original_filename_trgm",
+            "original_filename",
+            postgresql_using="gin",
+            postgresql_ops={"original_filename": "gin_trgm_ops"},
+        ),
+    )
+    # مقادیر پیش‌فرض سمت سرور (uploaded_at) با INSERT ... RETURNING همان لحظه خوانده می‌شوند
+    __mapper_args__ = {"eager_defaults": True}
 
     id = Column(Integer, primary_key=True)
     uuid = Column(String(36), unique=True, nullable=False, default=lambda: str(uuid.uuid4()))
@@ -32,7 +50,7 @@ class FileAttachment(Base):
     file_type = Column(Enum(FileType), nullable=False)
     mime_type = Column(String(100))
     file_size = Column(Integer)  # به بایت
-    file_hash = Column(String(64))  # SHA-256 برای یکتایی
+    file_hash = Column(String(80), index=True)  # "b2:" + BLAKE2b-256 برای یکتایی (قدیمی: SHA-256 بدون پیشوند)
 
     # مسیر ذخیره‌سازی
     storage_path = Column(String(500))
@@ -44,7 +62,7 @@ class FileAttachment(Base):
     encryption_key_id = Column(String(100))  # برای فایل‌های رمزنگاری شده
 
     # اطلاعات مالکیت
-    uploaded_by = Column(Integer, ForeignKey("users.id"), nullable=False)
+    uploaded_by = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     entity_type = Column(String(50))  # need_ad, user, charity, product, etc.
     entity_id = Column(Integer)  # ID موجودیت مرتبط
 
@@ -0,0 +1,23 @@
+# models/monthly_charity_financials.py
+from sqlalchemy import Column, Integer, Float, DateTime
+from models.base import Base
+
+
+class MonthlyCharityFinancials(Base):
+    """
+    جمع ماهانه مالی هر خیریه (materialized view، فقط خواندنی).
+    توسط migration ساخته و با FinancialReportService.refresh_monthly_rollup به‌روز می‌شود.
+    """
+    __tablename__ = "monthly_charity_financials"
+    # جدول واقعی نیست؛ autogenerate نباید آن را بسازد (alembic/env.py)
+    __table_args__ = {"info": {"is_view": True}}
+
+    charity_id = Column(Integer, primary_key=True)  # NULL: کمک‌های بدون خیریه
+    month = Column(DateTime(timezone=True), primary_key=True)
+
+    donations = Column(Float)
+    donation_count = Column(Integer)
+    sales = Column(Float)  # سهم خیریه از فروش
+    order_count = Column(Integer)
+    expenses = Column(Float)  # پرداخت به نیازمندان
+    completed_needs = Column(Integer)
@@ -1,5 +1,5 @@
 # app/models/need_ad.py
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, func, ForeignKey, Float, Enum, JSON
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, func, ForeignKey, Float, Enum, JSON, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import ENUM
 import uuid
@@ -10,6 +10,32 @@ from models.base import Base
 
 class NeedAd(Base):
     __tablename__ = "need_ads"
+    __table_args__ = (
+        # مبالغ نیازهای تکمیل‌شده هر خیریه بر اساس زمان به‌روزرسانی
+        Index(
+            "ix_need_ads_charity_status_updated",
+            "charity_id", "status", "updated_at",
+            postgresql_include=["collected_amount", "target_amount"],
+        ),
+        # فیلتر شهر/استان با ILIKE '%...%'؛ نیازمند افزونه pg_trgm
+        Index(
+            "ix_need_ads_city_trgm", "city",
+            postgresql_using="gin",
+            postgresql_ops={"city": "gin_trgm_ops"},
+        ),
+        Index(
+            "ix_need_ads_province_trgm", "province",
+            postgresql_using="gin",
+            postgresql_ops={"province": "gin_trgm_ops"},
+        ),
+        # مرتب‌سازی‌های مجاز لیست نیازها روی وضعیت‌های منتشرشده
+        Index("ix_need_ads_status_created_at", "status", "created_at"),
+        Index("ix_need_ads_status_target_amount", "status", "target_amount"),
+        Index("ix_need_ads_status_collected_amount", "status", "collected_amount"),
+        Index("ix_need_ads_status_deadline", "status", "deadline"),
+        # ستون search_tsv و ایندکس GIN آن فقط در PostgreSQL و فقط در migration تعریف شده‌اند
+        {"info": {"db_only_objects": ("search_tsv", "ix_need_ads_search_tsv")}},
+    )
 
     id = Column(Integer, primary_key=True)
     uuid = Column(String(36), unique=True, nullable=False, default=lambda: str(uuid.uuid4()))
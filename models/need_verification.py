@@ -1,5 +1,5 @@
 import enum
-from sqlalchemy import Column, Integer, ForeignKey, Enum, Text, DateTime, func
+from sqlalchemy import Column, Integer, ForeignKey, Enum, Text, DateTime, func, Index, text
 from sqlalchemy.orm import relationship
 
 from models.base import Base
@@ -13,6 +13,15 @@ class VerificationStatus(str, enum.Enum):
 
 class NeedVerification(Base):
     __tablename__ = "need_verifications"
+    __table_args__ = (
+        # شمارش و فیلتر «حداقل یک تأییدیه APPROVED» در لیست نیازها
+        Index(
+            "ix_need_verifications_approved",
+            "need_id",
+            postgresql_where=text("status = 'APPROVED'"),
+            sqlite_where=text("status = 'APPROVED'"),
+        ),
+    )
 
     id = Column(Integer, primary_key=True)
 
@@ -1,5 +1,5 @@
 # app/models/order_models.py
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, func, ForeignKey, Float, Enum, JSON
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, func, ForeignKey, Float, Enum, JSON, Index, text
 from sqlalchemy.orm import relationship
 import uuid
 from models.base import Base
@@ -101,6 +101,26 @@ class OrderItem(Base):
 class Order(Base):
     """سفارش"""
     __tablename__ = "orders"
+    __table_args__ = (
+        # سهم خیریه از سفارش‌های تحویل/تأییدشده در یک بازه زمانی
+        Index(
+            "ix_orders_charity_status_created",
+            "charity_id", "status", "created_at",
+            postgresql_include=["charity_amount", "grand_total"],
+        ),
+        # گزارش تأثیر: سفارش‌های مرتبط با نیاز در یک بازه زمانی (اختیاری برای یک خیریه)
+        Index(
+            "ix_orders_need_report",
+            "charity_id", "created_at",
+            postgresql_include=["need_id", "grand_total", "charity_amount"],
+            postgresql_where=text(
+                "need_id IS NOT NULL AND status IN ('delivered', 'confirmed', 'shipped')"
+            ),
+            sqlite_where=text(
+                "need_id IS NOT NULL AND status IN ('delivered', 'confirmed', 'shipped')"
+            ),
+        ),
+    )
 
     id = Column(Integer, primary_key=True)
     uuid = Column(String(36), unique=True, nullable=False, default=lambda: str(uuid.uuid4()))
@@ -178,7 +198,8 @@ class Order(Base):
     charity = relationship("Charity")
     need = relationship("NeedAd")
     coupon = relationship("Coupon")
-    items = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan")
+    # بارگذاری تنبل (یک کوئری برای هر سفارش) مجاز نیست؛ با selectinload(Order.items) بارگذاری شود
+    items = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan", lazy="raise")
     returns = relationship("ReturnRequest", back_populates="order", cascade="all, delete-orphan")
 
 
@@ -4,6 +4,7 @@ from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import UUID
 import uuid
 import enum
+from functools import cached_property
 from models.base import Base
 
 
@@ -286,6 +287,11 @@ class User(Base):
 
     # ========== متدهای کمکی ==========
 
+    @cached_property
+    def role_keys(self) -> frozenset:
+        """کلید نقش‌های کاربر؛ یک بار برای هر نمونه (هر درخواست) محاسبه می‌شود"""
+        return frozenset(role.key for role in self.roles)
+
     @property
     def display_name(self) -> str:
         """نام نمایشی کاربر"""
@@ -300,33 +306,33 @@ class User(Base):
     @property
     def is_needy(self) -> bool:
         """آیا کاربر نیازمند است؟"""
-        return any(role.key == "NEEDY" for role in self.roles)
+        return "NEEDY" in self.role_keys
 
     @property
     def is_donor(self) -> bool:
         """آیا کاربر خیر است؟"""
-        return any(role.key == "DONOR" for role in self.roles)
+        return "DONOR" in self.role_keys
 
     @property
     def is_vendor(self) -> bool:
         """آیا کاربر فروشنده است؟"""
-        return any(role.key == "VENDOR" for role in self.roles)
+        return "VENDOR" in self.role_keys
 
     @property
     def is_charity_manager(self) -> bool:
         """آیا کاربر مدیر خیریه است؟"""
-        return any(role.key == "CHARITY_MANAGER" for role in self.roles)
+        return "CHARITY_MANAGER" in self.role_keys
 
     @property
     def is_admin(self) -> bool:
-        return any(role.key == "SUPER_ADMIN" for role in self.roles)
+        return "SUPER_ADMIN" in self.role_keys
 
     @property
     def is_volunteer(self) -> bool:
         """آیا کاربر داوطلب است؟"""
-        return any(role.key == "VOLUNTEER" for role in self.roles)
+        return "VOLUNTEER" in self.role_keys
 
     @property
     def is_shop_manager(self) -> bool:
         """آیا کاربر مدیر فروشگاه است؟"""
-        return any(role.key == "SHOP_MANAGER" for role in self.roles)
\ No newline at end of file
+        return "SHOP_MANAGER" in self.role_keys
\ No newline at end of file
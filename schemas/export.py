@@ -28,6 +28,7 @@ class ExportRequest(BaseModel):
     filters: Optional[Dict[str, Any]] = None
     language: str = "fa"
     title: Optional[str] = None
+    compress: bool = False  # فقط برای CSV و JSON: ذخیره به صورت gzip
 
 
 class ExportColumn(BaseModel):
@@ -0,0 +1,16 @@
+# scripts/refresh_financial_rollup.py
+# اجرای شبانه (cron) برای به‌روزرسانی نمای تجمیعی monthly_charity_financials
+import asyncio
+
+from core.database import AsyncSessionLocal
+from services.financial_report import FinancialReportService
+
+
+async def refresh():
+    async with AsyncSessionLocal() as session:
+        await FinancialReportService(session).refresh_monthly_rollup()
+        print("✅ نمای تجمیعی مالی ماهانه به‌روز شد")
+
+
+if __name__ == "__main__":
+    asyncio.run(refresh())
@@ -0,0 +1,16 @@
+# scripts/refresh_need_trust_scores.py
+# پرکردن need_ads.trust_score برای نیازهای موجود؛ اجرای شبانه (cron) هم بخش وابسته به مهلت را تازه نگه می‌دارد
+import asyncio
+
+from core.database import AsyncSessionLocal
+from services.need_service import NeedService
+
+
+async def refresh():
+    async with AsyncSessionLocal() as session:
+        refreshed = await NeedService(session).refresh_all_trust_scores()
+        print(f"✅ امتیاز اعتماد {refreshed} نیاز به‌روز شد")
+
+
+if __name__ == "__main__":
+    asyncio.run(refresh())
@@ -14,6 +14,8 @@ from models.need_ad import NeedAd
 from models.charity import Charity
 from models.product import Product
 from models.order import Order
+from services.financial_report import FinancialReportService
+from services.need_service import NeedService
 from schemas.donation import (
     DonationCreate, DonationUpdate, DonationStatusUpdate,
     DonationFilter, PaymentInitiate, PaymentVerify,
@@ -163,6 +165,7 @@ class DonationService:
             # به‌روزرسانی مبلغ جمع‌آوری شده نیاز
             if donation.need:
                 donation.need.collected_amount = (donation.need.collected_amount or 0) + donation.amount
+                await NeedService(self.db).refresh_trust_score(donation.need)
                 self.db.add(donation.need)
 
                 # بررسی تکمیل شدن نیاز
@@ -179,11 +182,13 @@ class DonationService:
             # کاهش مبلغ جمع‌آوری شده نیاز
             if donation.need:
                 donation.need.collected_amount = max(0, (donation.need.collected_amount or 0) - donation.amount)
+                await NeedService(self.db).refresh_trust_score(donation.need)
                 self.db.add(donation.need)
 
         self.db.add(donation)
         await self.db.commit()
         await self.db.refresh(donation)
+        await FinancialReportService.invalidate_cache()
 
         # ثبت لاگ
         await self._log_donation_action(
@@ -277,6 +282,7 @@ class DonationService:
             # به‌روزرسانی مبلغ جمع‌آوری شده نیاز
             if donation.need:
                 donation.need.collected_amount = (donation.need.collected_amount or 0) + donation.amount
+                await NeedService(self.db).refresh_trust_score(donation.need)
                 self.db.add(donation.need)
 
                 # بررسی تکمیل شدن نیاز
@@ -301,6 +307,7 @@ class DonationService:
         self.db.add(donation)
         await self.db.commit()
         await self.db.refresh(donation)
+        await FinancialReportService.invalidate_cache()
 
         # ثبت لاگ
         await self._log_donation_action(
@@ -1,10 +1,13 @@
 # app/services/export_service.py
+import asyncio
 import csv
+import gzip
+import heapq
 import json
 import io
-from typing import Dict, Any, List
+from itertools import islice
+from typing import Dict, Any, List, Optional, Callable, Iterator, Tuple
 from datetime import datetime
-import pandas as pd
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4, landscape
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
@@ -14,12 +17,76 @@ from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 from fastapi import HTTPException
 import uuid
+import aiofiles
 import os
 
 from schemas.export import ExportRequest, ExportResult, ExportSheet, ExportColumn
+from utils.xlsx_writer import write_xlsx
+
+
+def _format_currency(value) -> str:
+    return f"{int(value):,}" if value else "۰"
+
+
+def _format_percentage(value) -> str:
+    return f"{value:.1f}%" if value is not None else "۰%"
+
+
+def _format_date(value) -> str:
+    if value and hasattr(value, 'strftime'):
+        return value.strftime("%Y/%m/%d")
+    return str(value)
+
+
+_FORMATTERS = {
+    "currency": _format_currency,
+    "percentage": _format_percentage,
+    "date": _format_date,
+}
+
+
+def _json_default(value):
+    # داده شیت‌ها ممکن است iterator/generator باشد
+    if isinstance(value, Iterator):
+        return list(value)
+    return str(value)
+
+
+def _top_items(items: List[Dict[str, Any]], key: str, k: int = 10) -> List[Dict[str, Any]]:
+    """k مورد برتر بر اساس key بدون مرتب‌سازی کامل لیست"""
+    return heapq.nlargest(k, items, key=lambda item: item.get(key) or 0)
+
+
+def _make_formatter(fmt: Optional[str]) -> Callable[[Any], str]:
+    """فرمت‌کننده مقدار سلول بر اساس format ستون"""
+    return _FORMATTERS.get(fmt, str)
 
 
 class ExportService:
+    # سطح ۱ بیشتر فشرده‌سازی داده جدولی را با کمترین هزینه CPU به دست می‌آورد
+    GZIP_LEVEL = 1
+
+    # سقف سطرهای هر شیت در PDF؛ خروجی کامل داده‌های حجیم از مسیر Excel/CSV گرفته می‌شود
+    PDF_MAX_ROWS_PER_SHEET = 100
+
+    # تعداد سطر هر جدول در PDF؛ جداول بلند در ReportLab چیدمان غیرخطی دارند
+    PDF_TABLE_CHUNK_ROWS = 40
+
+    SHEET_TABLE_STYLE = TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Vazir-Bold'),
+        ('FONTNAME', (0, 1), (-1, -1), 'Vazir'),
+        ('FONTSIZE', (0, 0), (-1, 0), 11),
+        ('FONTSIZE', (0, 1), (-1, -1), 9),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('WORDWRAP', (0, 0), (-1, -1), 'RTL'),
+    ])
+
     def __init__(self):
         self.export_dir = "exports"
         os.makedirs(self.export_dir, exist_ok=True)
@@ -32,40 +99,32 @@ class ExportService:
             print("Warning: Vazir font not found. Falling back to Helvetica.")
 
     async def export_data(self, request: ExportRequest, data: Dict[str, Any]) -> ExportResult:
-        """خروجی‌گیری از داده‌ها"""
-
-        if request.format == "csv":
-            return await self._export_csv(data, request)
-        elif request.format == "excel":
-            return await self._export_excel(data, request)
-        elif request.format == "pdf":
-            return await self._export_pdf(data, request)
-        elif request.format == "json":
-            return await self._export_json(data, request)
-        else:
+        """
+        خروجی‌گیری از داده‌ها
+        data["sheets"][i]["data"] می‌تواند هر iterable از dict سطرها باشد (مثلاً generator)
+        تا خروجی Excel بدون نگه داشتن نسخه دوم سطرها نوشته شود
+        """
+
+        handler = self._EXPORTERS.get(request.format)
+        if handler is None:
             raise HTTPException(status_code=400, detail=f"Unsupported format: {request.format}")
+        return await handler(self, data, request)
+
+    def _export_path(self, request: ExportRequest, ext: str) -> Tuple[datetime, str, str]:
+        """زمان تولید، نام و مسیر فایل خروجی"""
+        now = datetime.utcnow()
+        filename = f"{request.template.value}_{now.strftime('%Y%m%d_%H%M%S')}.{ext}"
+        return now, filename, os.path.join(self.export_dir, filename)
 
     async def _export_csv(self, data: Dict[str, Any], request: ExportRequest) -> ExportResult:
         """خروجی CSV - ساده و سریع"""
 
-        output = io.StringIO()
-        writer = csv.writer(output, quoting=csv.QUOTE_ALL)
+        now, filename, filepath = self._export_path(request, "csv.gz" if request.compress else "csv")
 
-        # نوشتن هدر (اولین sheet)
-        if data.get("sheets"):
-            first_sheet = data["sheets"][0]
-            if "columns" in first_sheet:
-                writer.writerow([col["header"] for col in first_sheet["columns"]])
-                for row in first_sheet.get("data", []):
-                    writer.writerow([row.get(col["key"], "") for col in first_sheet["columns"]])
-
-        filename = f"{request.template.value}_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.csv"
-        filepath = os.path.join(self.export_dir, filename)
-
-        with open(filepath, "w", encoding="utf-8-sig") as f:  # utf-8-sig برای اکسل فارسی
-            f.write(output.getvalue())
-
-        file_size = os.path.getsize(filepath)
+        content = await asyncio.to_thread(self._csv_bytes, data)
+        if request.compress:
+            content = await asyncio.to_thread(gzip.compress, content, self.GZIP_LEVEL)
+        file_size = await self._save_file(filepath, content)
 
         return ExportResult(
             success=True,
@@ -73,52 +132,16 @@ class ExportService:
             filename=filename,
             file_size=file_size,
             file_url=f"/exports/{filename}",
-            generated_at=datetime.utcnow()
+            generated_at=now
         )
 
     async def _export_excel(self, data: Dict[str, Any], request: ExportRequest) -> ExportResult:
         """خروجی Excel با چند شیت + رتبه‌بندی"""
 
-        filename = f"{request.template.value}_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        filepath = os.path.join(self.export_dir, filename)
-
-        with pd.ExcelWriter(filepath, engine='openpyxl') as writer:
-            for sheet in data.get("sheets", []):
-                if "data" in sheet and "columns" in sheet:
-                    df = pd.DataFrame(sheet["data"])
-                    # ستون‌ها رو به ترتیب columns مرتب می‌کنیم
-                    columns_order = [col["key"] for col in sheet["columns"]]
-                    df = df.reindex(columns=columns_order, fill_value="")
-                    df.columns = [col["header"] for col in sheet["columns"]]
-                    df.to_excel(writer, sheet_name=sheet["name"], index=False)
-
-            # اضافه کردن شیت رتبه‌بندی اگر وجود داشته باشد
-            if "top_products" in data:
-                df_top = pd.DataFrame(data["top_products"])
-                df_top.to_excel(writer, sheet_name="رتبه‌بندی محصولات", index=False)
-
-            if "top_charities" in data:
-                df_top_charity = pd.DataFrame(data["top_charities"])
-                df_top_charity.to_excel(writer, sheet_name="رتبه‌بندی خیریه‌ها", index=False)
-
-            if "comparison" in data:
-                comparison_data = {
-                    "معیار": ["دوره فعلی", "دوره قبلی", "نرخ رشد"],
-                    "درآمد کل": [
-                        data["comparison"]["current"].get("total_revenue", 0),
-                        data["comparison"]["previous"].get("total_revenue", 0),
-                        f"{data['comparison']['growth'].get('revenue_growth_percent', 0):.2f}%"
-                    ],
-                    "کمک کل": [
-                        data["comparison"]["current"].get("total_donations", 0),
-                        data["comparison"]["previous"].get("total_donations", 0),
-                        f"{data['comparison']['growth'].get('donations_growth_percent', 0):.2f}%"
-                    ]
-                }
-                df_comparison = pd.DataFrame(comparison_data)
-                df_comparison.to_excel(writer, sheet_name="مقایسه دوره‌ها", index=False)
-
-        file_size = os.path.getsize(filepath)
+        now, filename, filepath = self._export_path(request, "xlsx")
+
+        # ساخت فایل اکسل CPU-محور است و نباید event loop را مسدود کند
+        file_size = await asyncio.to_thread(self._write_excel_sync, filepath, data)
 
         return ExportResult(
             success=True,
@@ -127,16 +150,16 @@ class ExportService:
             file_size=file_size,
             file_url=f"/exports/{filename}",
             sheets=[s["name"] for s in data.get("sheets", [])],
-            generated_at=datetime.utcnow()
+            generated_at=now
         )
 
     async def _export_pdf(self, data: Dict[str, Any], request: ExportRequest) -> ExportResult:
         """خروجی PDF با فونت فارسی + راست‌به‌چپ + رتبه‌بندی + مقایسه"""
 
-        filename = f"{request.template.value}_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.pdf"
-        filepath = os.path.join(self.export_dir, filename)
+        now, filename, filepath = self._export_path(request, "pdf")
 
-        doc = SimpleDocTemplate(filepath, pagesize=landscape(A4), rightMargin=30, leftMargin=30, topMargin=30, bottomMargin=30)
+        buffer = io.BytesIO()
+        doc = SimpleDocTemplate(buffer, pagesize=landscape(A4), rightMargin=30, leftMargin=30, topMargin=30, bottomMargin=30)
         story = []
         styles = getSampleStyleSheet()
 
@@ -172,124 +195,18 @@ class ExportService:
             alignment=2,  # راست
             wordWrap='RTL'
         )
-        date_text = f"تاریخ تولید: {datetime.utcnow().strftime('%Y/%m/%d %H:%M')}"
+        date_text = f"تاریخ تولید: {now.strftime('%Y/%m/%d %H:%M')}"
         date_p = Paragraph(date_text, date_style)
         story.append(date_p)
         story.append(Spacer(1, 0.3 * inch))
 
-        # جداول اصلی
+        # هر بخش مستقل از بقیه ساخته می‌شود و به ترتیب به story اضافه می‌شود
         for sheet in data.get("sheets", []):
-            story.append(Paragraph(sheet["name"], styles['Heading2']))
-            story.append(Spacer(1, 0.1 * inch))
-
-            table_data = []
-            headers = [col["header"] for col in sheet["columns"]]
-            table_data.append(headers)
-
-            for row in sheet["data"][:100]:  # افزایش به ۱۰۰ سطر
-                table_row = []
-                for col in sheet["columns"]:
-                    value = row.get(col["key"], "")
-                    if col.get("format") == "currency":
-                        value = f"{int(value):,}" if value else "۰"
-                    elif col.get("format") == "percentage":
-                        value = f"{value:.1f}%" if value is not None else "۰%"
-                    elif col.get("format") == "date" and value:
-                        value = value.strftime("%Y/%m/%d") if hasattr(value, 'strftime') else str(value)
-                    table_row.append(str(value))
-                table_data.append(table_row)
-
-            table = Table(table_data, repeatRows=1)
-            table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), vazir_bold),
-                ('FONTNAME', (0, 1), (-1, -1), vazir),
-                ('FONTSIZE', (0, 0), (-1, 0), 11),
-                ('FONTSIZE', (0, 1), (-1, -1), 9),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                ('WORDWRAP', (0, 0), (-1, -1), 'RTL'),
-            ]))
-            story.append(table)
-            story.append(Spacer(1, 0.3 * inch))
-
-        # بخش رتبه‌بندی (اگر وجود داشته باشد)
-        if "top_products" in data or "top_charities" in data:
-            story.append(Paragraph("رتبه‌بندی ۱۰ مورد برتر", styles['Heading2']))
-            story.append(Spacer(1, 0.1 * inch))
-
-            if "top_products" in data:
-                story.append(Paragraph("۱۰ محصول برتر از نظر درآمد", styles['Heading3']))
-                top_data = [["رتبه", "محصول", "درآمد", "کمک به خیریه"]]
-                for i, item in enumerate(data["top_products"][:10], 1):
-                    top_data.append([
-                        i,
-                        item.get("product_name", "نامشخص"),
-                        f"{item.get('revenue', 0):,}",
-                        f"{item.get('charity_amount', 0):,}"
-                    ])
-                top_table = Table(top_data)
-                top_table.setStyle(TableStyle([
-                    ('FONTNAME', (0,0), (-1,-1), vazir),
-                    ('BACKGROUND', (0,0), (-1,0), colors.lightblue),
-                    ('GRID', (0,0), (-1,-1), 0.5, colors.black),
-                ]))
-                story.append(top_table)
-                story.append(Spacer(1, 0.2 * inch))
-
-            if "top_charities" in data:
-                story.append(Paragraph("۱۰ خیریه برتر از نظر کمک دریافتی", styles['Heading3']))
-                top_data = [["رتبه", "خیریه", "کمک کل"]]
-                for i, item in enumerate(data["top_charities"][:10], 1):
-                    top_data.append([
-                        i,
-                        item.get("charity_name", "نامشخص"),
-                        f"{item.get('total_received', 0):,}"
-                    ])
-                top_table = Table(top_data)
-                top_table.setStyle(TableStyle([
-                    ('FONTNAME', (0,0), (-1,-1), vazir),
-                    ('BACKGROUND', (0,0), (-1,0), colors.lightgreen),
-                    ('GRID', (0,0), (-1,-1), 0.5, colors.black),
-                ]))
-                story.append(top_table)
-
-            story.append(PageBreak())
-
-        # بخش مقایسه دوره‌ای (اگر وجود داشته باشد)
-        if "comparison" in data:
-            story.append(Paragraph("مقایسه دوره‌ای", styles['Heading2']))
-            story.append(Spacer(1, 0.1 * inch))
-
-            cmp_data = [
-                ["معیار", "دوره فعلی", "دوره قبلی", "نرخ رشد"],
-                ["درآمد کل",
-                 f"{data['comparison']['current']['total_revenue']:,}",
-                 f"{data['comparison']['previous']['total_revenue']:,}",
-                 f"{data['comparison']['growth']['revenue_growth_percent']:.1f}%"
-                ],
-                ["کمک کل",
-                 f"{data['comparison']['current']['total_donations']:,}",
-                 f"{data['comparison']['previous']['total_donations']:,}",
-                 f"{data['comparison']['growth']['donations_growth_percent']:.1f}%"
-                ]
-            ]
-
-            cmp_table = Table(cmp_data)
-            cmp_table.setStyle(TableStyle([
-                ('FONTNAME', (0,0), (-1,-1), vazir),
-                ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
-                ('GRID', (0,0), (-1,-1), 0.5, colors.black),
-                ('ALIGN', (1,1), (-1,-1), 'RIGHT'),
-            ]))
-            story.append(cmp_table)
+            story.extend(self._pdf_sheet_section(sheet, styles))
+        story.extend(self._pdf_rankings_section(data, styles, vazir))
+        story.extend(self._pdf_comparison_section(data, styles, vazir))
 
-        doc.build(story)
-        file_size = os.path.getsize(filepath)
+        file_size = await asyncio.to_thread(self._build_pdf_sync, doc, story, buffer, filepath)
 
         return ExportResult(
             success=True,
@@ -297,19 +214,201 @@ class ExportService:
             filename=filename,
             file_size=file_size,
             file_url=f"/exports/{filename}",
-            generated_at=datetime.utcnow()
+            generated_at=now
         )
 
+    def _write_excel_sync(self, filepath: str, data: Dict[str, Any]) -> int:
+        """نوشتن همگام فایل Excel؛ در thread جداگانه اجرا می‌شود"""
+        return write_xlsx(filepath, self._excel_sheets(data))
+
+    @staticmethod
+    def _build_pdf_sync(doc: SimpleDocTemplate, story: List[Any], buffer: io.BytesIO, filepath: str) -> int:
+        """ساخت PDF در حافظه و نوشتن آن روی دیسک؛ در thread جداگانه اجرا می‌شود"""
+        doc.build(story)
+        content = buffer.getbuffer()
+        with open(filepath, "wb") as f:
+            f.write(content)
+        return len(content)
+
+    @staticmethod
+    def _excel_sheets(data: Dict[str, Any]):
+        """شیت‌های فایل Excel به صورت (نام، سرستون‌ها، سطرها، format ستون‌ها)"""
+        for sheet in data.get("sheets", []):
+            if "data" in sheet and "columns" in sheet:
+                # ستون‌ها به ترتیب columns
+                keys = [col["key"] for col in sheet["columns"]]
+                headers = [col["header"] for col in sheet["columns"]]
+                formats = [col.get("format") for col in sheet["columns"]]
+                # سطرها به صورت جریانی ساخته می‌شوند تا داده شیت هرگز کامل در حافظه کپی نشود
+                rows = ([row.get(k, "") for k in keys] for row in sheet["data"])
+                yield sheet["name"], headers, rows, formats
+
+        # اضافه کردن شیت رتبه‌بندی اگر وجود داشته باشد
+        for key, sheet_name in (("top_products", "رتبه‌بندی محصولات"), ("top_charities", "رتبه‌بندی خیریه‌ها")):
+            if key in data:
+                items = data[key]
+                keys = list(dict.fromkeys(k for item in items for k in item))
+                yield sheet_name, keys, [[item.get(k) for k in keys] for item in items], None
+
+        if "comparison" in data:
+            comparison = data["comparison"]
+            cur, prev, growth = comparison["current"], comparison["previous"], comparison["growth"]
+            yield "مقایسه دوره‌ها", ["معیار", "درآمد کل", "کمک کل"], [
+                ["دوره فعلی", cur.get("total_revenue", 0), cur.get("total_donations", 0)],
+                ["دوره قبلی", prev.get("total_revenue", 0), prev.get("total_donations", 0)],
+                ["نرخ رشد",
+                 f"{growth.get('revenue_growth_percent', 0):.2f}%",
+                 f"{growth.get('donations_growth_percent', 0):.2f}%"],
+            ], ["", "currency", "currency"]
+
+    @staticmethod
+    def _csv_bytes(data: Dict[str, Any]) -> bytes:
+        """محتوای CSV (اولین sheet)؛ در thread جداگانه اجرا می‌شود"""
+        output = io.StringIO()
+        writer = csv.writer(output, quoting=csv.QUOTE_ALL)
+
+        # نوشتن هدر (اولین sheet)
+        if data.get("sheets"):
+            first_sheet = data["sheets"][0]
+            if "columns" in first_sheet:
+                writer.writerow([col["header"] for col in first_sheet["columns"]])
+                for row in first_sheet.get("data", []):
+                    writer.writerow([row.get(col["key"], "") for col in first_sheet["columns"]])
+
+        return output.getvalue().encode("utf-8-sig")  # utf-8-sig برای اکسل فارسی
+
+    @staticmethod
+    def _json_bytes(data: Dict[str, Any]) -> bytes:
+        """محتوای JSON؛ در thread جداگانه اجرا می‌شود"""
+        return json.dumps(data, ensure_ascii=False, indent=2, default=_json_default).encode("utf-8")
+
+    @staticmethod
+    async def _save_file(filepath: str, content: bytes) -> int:
+        """ذخیره فایل خروجی بدون مسدود کردن event loop"""
+        async with aiofiles.open(filepath, "wb") as f:
+            await f.write(content)
+        return len(content)
+
+    def _pdf_sheet_section(self, sheet: Dict[str, Any], styles) -> List[Any]:
+        """بخش جدول یک شیت در PDF"""
+        story = [Paragraph(sheet["name"], styles['Heading2']), Spacer(1, 0.1 * inch)]
+
+        table_data = []
+        headers = [col["header"] for col in sheet["columns"]]
+        table_data.append(headers)
+
+        # قالب‌بندی ستونی: هر ستون یک بار با فرمت‌کننده خودش map می‌شود
+        rows = list(islice(sheet["data"], self.PDF_MAX_ROWS_PER_SHEET))
+        formatted_columns = [
+            list(map(_make_formatter(col.get("format")), [row.get(col["key"], "") for row in rows]))
+            for col in sheet["columns"]
+        ]
+        table_data.extend(list(cells) for cells in zip(*formatted_columns))
+
+        # شکستن جدول به تکه‌های کوچک تا چیدمان ReportLab خطی بماند
+        header_row = table_data[0]
+        chunk = self.PDF_TABLE_CHUNK_ROWS
+        for start in range(1, max(len(table_data), 2), chunk):
+            table = Table(
+                [header_row] + table_data[start:start + chunk],
+                repeatRows=1,
+                style=self.SHEET_TABLE_STYLE
+            )
+            story.append(table)
+            story.append(Spacer(1, 0.1 * inch))
+        story.append(Spacer(1, 0.2 * inch))
+        return story
+
+    def _pdf_rankings_section(self, data: Dict[str, Any], styles, font: str) -> List[Any]:
+        """بخش رتبه‌بندی ۱۰ مورد برتر در PDF"""
+        if "top_products" not in data and "top_charities" not in data:
+            return []
+
+        story = [Paragraph("رتبه‌بندی ۱۰ مورد برتر", styles['Heading2']), Spacer(1, 0.1 * inch)]
+
+        if "top_products" in data:
+            story.append(Paragraph("۱۰ محصول برتر از نظر درآمد", styles['Heading3']))
+            top_data = [["رتبه", "محصول", "درآمد", "کمک به خیریه"]]
+            for i, item in enumerate(_top_items(data["top_products"], "revenue"), 1):
+                get = item.get
+                top_data.append([
+                    i,
+                    get("product_name", "نامشخص"),
+                    f"{get('revenue', 0):,}",
+                    f"{get('charity_amount', 0):,}"
+                ])
+            top_table = Table(top_data)
+            top_table.setStyle(TableStyle([
+                ('FONTNAME', (0,0), (-1,-1), font),
+                ('BACKGROUND', (0,0), (-1,0), colors.lightblue),
+                ('GRID', (0,0), (-1,-1), 0.5, colors.black),
+            ]))
+            story.append(top_table)
+            story.append(Spacer(1, 0.2 * inch))
+
+        if "top_charities" in data:
+            story.append(Paragraph("۱۰ خیریه برتر از نظر کمک دریافتی", styles['Heading3']))
+            top_data = [["رتبه", "خیریه", "کمک کل"]]
+            for i, item in enumerate(_top_items(data["top_charities"], "total_received"), 1):
+                get = item.get
+                top_data.append([
+                    i,
+                    get("charity_name", "نامشخص"),
+                    f"{get('total_received', 0):,}"
+                ])
+            top_table = Table(top_data)
+            top_table.setStyle(TableStyle([
+                ('FONTNAME', (0,0), (-1,-1), font),
+                ('BACKGROUND', (0,0), (-1,0), colors.lightgreen),
+                ('GRID', (0,0), (-1,-1), 0.5, colors.black),
+            ]))
+            story.append(top_table)
+
+        story.append(PageBreak())
+        return story
+
+    def _pdf_comparison_section(self, data: Dict[str, Any], styles, font: str) -> List[Any]:
+        """بخش مقایسه دوره‌ای در PDF"""
+        if "comparison" not in data:
+            return []
+
+        story = [Paragraph("مقایسه دوره‌ای", styles['Heading2']), Spacer(1, 0.1 * inch)]
+
+        comparison = data["comparison"]
+        cur, prev, growth = comparison["current"], comparison["previous"], comparison["growth"]
+        cmp_data = [
+            ["معیار", "دوره فعلی", "دوره قبلی", "نرخ رشد"],
+            ["درآمد کل",
+             f"{cur['total_revenue']:,}",
+             f"{prev['total_revenue']:,}",
+             f"{growth['revenue_growth_percent']:.1f}%"
+            ],
+            ["کمک کل",
+             f"{cur['total_donations']:,}",
+             f"{prev['total_donations']:,}",
+             f"{growth['donations_growth_percent']:.1f}%"
+            ]
+        ]
+
+        cmp_table = Table(cmp_data)
+        cmp_table.setStyle(TableStyle([
+            ('FONTNAME', (0,0), (-1,-1), font),
+            ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
+            ('GRID', (0,0), (-1,-1), 0.5, colors.black),
+            ('ALIGN', (1,1), (-1,-1), 'RIGHT'),
+        ]))
+        story.append(cmp_table)
+        return story
+
     async def _export_json(self, data: Dict[str, Any], request: ExportRequest) -> ExportResult:
         """خروجی JSON - بدون تغییر بزرگ"""
 
-        filename = f"{request.template.value}_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.json"
-        filepath = os.path.join(self.export_dir, filename)
-
-        with open(filepath, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2, default=str)
+        now, filename, filepath = self._export_path(request, "json.gz" if request.compress else "json")
 
-        file_size = os.path.getsize(filepath)
+        content = await asyncio.to_thread(self._json_bytes, data)
+        if request.compress:
+            content = await asyncio.to_thread(gzip.compress, content, self.GZIP_LEVEL)
+        file_size = await self._save_file(filepath, content)
 
         return ExportResult(
             success=True,
@@ -317,5 +416,16 @@ class ExportService:
             filename=filename,
             file_size=file_size,
             file_url=f"/exports/{filename}",
-            generated_at=datetime.utcnow()
-        )
\ No newline at end of file
+            generated_at=now
+        )
+
+    _EXPORTERS = {
+        "csv": _export_csv,
+        "excel": _export_excel,
+        "pdf": _export_pdf,
+        "json": _export_json,
+    }
+
+
+# یک نمونه مشترک برای همه درخواست‌ها؛ ساخت پوشه و ثبت فونت فقط یک بار انجام می‌شود
+export_service = ExportService()
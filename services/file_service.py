@@ -1,66 +1,167 @@
 # services/file_service.py
 import os
+import asyncio
+import logging
+import base64
 import hashlib
 import mimetypes
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional, List, Dict, Any, BinaryIO, Tuple
+from typing import Optional, List, Dict, Any, BinaryIO, Tuple, AsyncIterator
 from datetime import datetime, timedelta
 import aiofiles
 from fastapi import UploadFile, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_, or_, desc
+from sqlalchemy import select, update, delete, bindparam, func, and_, or_, desc
+from sqlalchemy.exc import IntegrityError
 import uuid
 import secrets
-from cryptography.fernet import Fernet
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 
+from core.config import settings
 from models.file_attachment import FileAttachment, FileType, FileAccessLevel
 from models.file_access_log import FileAccessLog
 from models.user import User
 from schemas.file import FileUpload, FileFilter, FileUpdate
 
+logger = logging.getLogger(__name__)
+
+
+ALLOWED_MIME_TYPES = {
+    "image": frozenset(["image/jpeg", "image/png", "image/gif", "image/webp"]),
+    "document": frozenset([
+        "application/pdf",
+        "application/msword",
+        "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+        "text/plain",
+        "application/vnd.ms-excel",
+        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    ])
+}
+
+# نوع فایل برای هر MIME مجاز؛ تعیین نوع و بررسی مجاز بودن با یک lookup
+_MIME_TO_TYPE = {
+    **{mime: FileType.IMAGE for mime in ALLOWED_MIME_TYPES["image"]},
+    **{mime: FileType.DOCUMENT for mime in ALLOWED_MIME_TYPES["document"]},
+    "application/pdf": FileType.PDF,
+}
+
+
+# thread pool جدا برای hash و رمزنگاری/رمزگشایی تکه‌ها، به اندازه تعداد هسته‌ها؛
+# کار CPU سنگین نه event loop را می‌گیرد و نه thread pool پیش‌فرض (I/O فایل‌ها) را پر می‌کند
+_CRYPTO_EXECUTOR = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="file-crypto")
+
+
+async def _run_crypto(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(_CRYPTO_EXECUTOR, func, *args)
+
+
+# فیلترهای ساده list_files: نام فیلد FileFilter -> شرط با پارامتر bind هم‌نام
+_LIST_FILE_FILTERS = {
+    "file_type": lambda: FileAttachment.file_type == bindparam("file_type"),
+    "access_level": lambda: FileAttachment.access_level == bindparam("access_level"),
+    "entity_type": lambda: FileAttachment.entity_type == bindparam("entity_type"),
+    "entity_id": lambda: FileAttachment.entity_id == bindparam("entity_id"),
+    "uploaded_by": lambda: FileAttachment.uploaded_by == bindparam("uploaded_by"),
+    "min_size": lambda: FileAttachment.file_size >= bindparam("min_size"),
+    "max_size": lambda: FileAttachment.file_size <= bindparam("max_size"),
+    "start_date": lambda: FileAttachment.uploaded_at >= bindparam("start_date"),
+    "end_date": lambda: FileAttachment.uploaded_at <= bindparam("end_date"),
+    "search_text": lambda: or_(
+        FileAttachment.original_filename.ilike(bindparam("search_text")),
+        FileAttachment.title.ilike(bindparam("search_text")),
+        FileAttachment.description.ilike(bindparam("search_text"))
+    ),
+}
+
+
+@lru_cache(maxsize=64)
+def _list_files_statement(filter_names: Tuple[str, ...], access: str, sort_by: str, descending: bool):
+    """
+    کوئری list_files برای یک ترکیب فیلتر، یک بار ساخته و نگه داشته می‌شود؛
+    مقادیر فیلترها فقط به‌عنوان پارامتر bind در هر درخواست فرستاده می‌شوند.
+    access: admin (بدون محدودیت)، needy، user یا guest
+    """
+    conditions = [FileAttachment.is_active == True]
+    conditions.extend(_LIST_FILE_FILTERS[name]() for name in filter_names)
+
+    if access in ("user", "needy"):
+        # کاربران عادی فقط فایل‌های عمومی، محافظت‌شده یا فایل‌های خودشان را می‌بینند
+        access_conditions = [
+            FileAttachment.access_level.in_([FileAccessLevel.PUBLIC, FileAccessLevel.PROTECTED]),
+            FileAttachment.uploaded_by == bindparam("user_id")
+        ]
+
+        # اگر کاربر نیازمند است، فایل‌های private خودش را هم می‌بیند
+        if access == "needy":
+            access_conditions.append(
+                and_(
+                    FileAttachment.access_level == FileAccessLevel.PRIVATE,
+                    FileAttachment.uploaded_by == bindparam("user_id")
+                )
+            )
+
+        conditions.append(or_(*access_conditions))
+    elif access == "guest":
+        # کاربران مهمان فقط فایل‌های عمومی
+        conditions.append(FileAttachment.access_level == FileAccessLevel.PUBLIC)
+
+    # مرتب‌سازی
+    sort_column = getattr(FileAttachment, sort_by, FileAttachment.uploaded_at)
+    return (
+        select(FileAttachment)
+        .where(and_(*conditions))
+        .order_by(sort_column.desc() if descending else sort_column.asc())
+    )
+
 
 class FileService:
+    # اندازه هر تکه در خواندن/نوشتن فایل
+    CHUNK_SIZE = 1024 * 1024  # 1MB
+    # طول nonce و tag در AES-GCM
+    NONCE_SIZE = 12
+    TAG_SIZE = 16
+    # پیشوند الگوریتم hash محتوا؛ رکوردهای قدیمی SHA-256 بدون پیشوند هستند
+    HASH_PREFIX = "b2:"
+    # تعداد فایل‌هایی که در پاک‌سازی همزمان حذف می‌شوند
+    CLEANUP_BATCH_SIZE = 32
+    # پوشه‌هایی که در این پروسه ساخته شده‌اند
+    _created_dirs: set = set()
+
     def __init__(self, db: AsyncSession):
         self.db = db
         self.storage_path = os.getenv("FILE_STORAGE_PATH", "./uploads")
         self.max_file_size = 100 * 1024 * 1024  # 100MB
-        self.allowed_mime_types = {
-            "image": ["image/jpeg", "image/png", "image/gif", "image/webp"],
-            "document": [
-                "application/pdf",
-                "application/msword",
-                "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-                "text/plain",
-                "application/vnd.ms-excel",
-                "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-            ]
-        }
-
-        # ایجاد پوشه ذخیره‌سازی
-        Path(self.storage_path).mkdir(parents=True, exist_ok=True)
-
-        # کلید رمزنگاری (در پروژه واقعی از مدیریت کلید استفاده کن)
-        self.encryption_key = Fernet.generate_key()
-        self.cipher = Fernet(self.encryption_key)
+        self.allowed_mime_types = ALLOWED_MIME_TYPES
+
+        # ایجاد پوشه ذخیره‌سازی و پوشه فایل‌های موقت آپلود
+        self.temp_path = Path(self.storage_path) / "tmp"
+        self._ensure_dir(self.temp_path)
+
+        # کلید رمزنگاری AES-256-GCM از تنظیمات (base64 کلید ۳۲ بایتی)؛ بدون آن فایل حساس رمز نمی‌شود
+        # و با کلید موقت هم رمز نمی‌شود، چون بعد از راه‌اندازی مجدد قابل بازگشایی نیست.
+        # در رکورد فایل فقط شناسه کلید ذخیره می‌شود، نه خود کلید
+        self.encryption_key = None
+        self.encryption_key_id = None
+        if settings.FILE_ENCRYPTION_KEY:
+            self.encryption_key = base64.urlsafe_b64decode(settings.FILE_ENCRYPTION_KEY)
+            if len(self.encryption_key) != 32:
+                raise RuntimeError("FILE_ENCRYPTION_KEY must be a base64-encoded 32-byte key")
+            self.encryption_key_id = hashlib.sha256(self.encryption_key).hexdigest()[:16]
 
     async def upload_file(
             self,
             file: UploadFile,
             upload_data: FileUpload,
             user: User,
-            encrypt_sensitive: bool = True
+            encrypt_sensitive: bool = True,
+            commit: bool = True
     ) -> FileAttachment:
-        """آپلود و ذخیره فایل جدید"""
-
-        # بررسی حجم فایل
-        content = await file.read()
-        await file.seek(0)
-
-        if len(content) > self.max_file_size:
-            raise HTTPException(
-                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-                detail=f"File size exceeds limit: {self.max_file_size // (1024 * 1024)}MB"
-            )
+        """
+        آپلود و ذخیره فایل جدید
+        با commit=False رکورد فقط flush می‌شود تا فراخواننده آن را همراه رکوردهای خودش commit کند
+        """
 
         # بررسی نوع فایل
         mime_type = file.content_type or mimetypes.guess_type(file.filename)[0] or "application/octet-stream"
@@ -72,30 +173,33 @@ class FileService:
                 detail=f"File type {mime_type} is not allowed"
             )
 
-        # محاسبه hash فایل
-        file_hash = self._calculate_file_hash(content)
+        # خواندن تکه‌تکه فایل، محاسبه hash، بررسی حجم و رمزنگاری در یک گذر
+        encrypt = encrypt_sensitive and upload_data.access_level == FileAccessLevel.SENSITIVE
+        if encrypt:
+            self._require_encryption_key()
+        temp_path, file_hash, file_size = await self._stream_to_temp(file, encrypt)
 
-        # بررسی تکراری نبودن فایل
-        existing = await self.db.execute(
-            select(FileAttachment).where(FileAttachment.file_hash == file_hash)
-        )
-        if existing.scalar_one_or_none():
-            raise HTTPException(
-                status_code=status.HTTP_409_CONFLICT,
-                detail="File already exists"
+        try:
+            # بررسی تکراری نبودن فایل
+            duplicate = await self.db.scalar(
+                select(FileAttachment.id).where(FileAttachment.file_hash == file_hash).limit(1)
             )
+            if duplicate:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="File already exists"
+                )
 
-        # نام یکتا برای ذخیره‌سازی
-        file_ext = Path(file.filename).suffix or self._get_extension_from_mime(mime_type)
-        stored_filename = f"{uuid.uuid4().hex}{file_ext}"
-        storage_path = self._get_storage_path(file_type, stored_filename)
-
-        # رمزنگاری اگر فایل حساس است
-        if encrypt_sensitive and upload_data.access_level == FileAccessLevel.SENSITIVE:
-            content = self._encrypt_content(content)
+            # ذخیره بر اساس hash محتوا؛ نسخه رمز شده نام جدا دارد چون محتوای روی دیسک متفاوت است
+            stored_filename = file_hash[len(self.HASH_PREFIX):] + (".enc" if encrypt else "")
+            storage_path = self._get_storage_path(stored_filename)
 
-        # ذخیره فایل
-        await self._save_file(storage_path, content)
+            # جایگزینی اتمی: فایل باقی‌مانده از آپلود ناموفق قبلی (بدون رکورد) کورکورانه استفاده نمی‌شود
+            # و با نسخه کامل همین آپلود بازنویسی می‌شود؛ آپلود همزمان همین محتوا هم فایل معتبری از
+            # همان محتوا (با همان کلید) جایگزین می‌کند
+            await asyncio.to_thread(os.replace, temp_path, storage_path)
+        finally:
+            await asyncio.to_thread(Path(temp_path).unlink, missing_ok=True)
 
         # ایجاد رکورد در دیتابیس
         file_attachment = FileAttachment(
@@ -103,12 +207,12 @@ class FileService:
             stored_filename=stored_filename,
             file_type=file_type,
             mime_type=mime_type,
-            file_size=len(content),
+            file_size=file_size,
             file_hash=file_hash,
             storage_path=storage_path,
             access_level=upload_data.access_level,
-            is_encrypted=(encrypt_sensitive and upload_data.access_level == FileAccessLevel.SENSITIVE),
-            encryption_key_id=self.encryption_key.decode() if encrypt_sensitive else None,
+            is_encrypted=encrypt,
+            encryption_key_id=self.encryption_key_id if encrypt else None,
             uploaded_by=user.id,
             entity_type=upload_data.entity_type,
             entity_id=upload_data.entity_id,
@@ -119,16 +223,33 @@ class FileService:
         )
 
         self.db.add(file_attachment)
-        await self.db.commit()
-        await self.db.refresh(file_attachment)
-
-        # ثبت لاگ
+        try:
+            await self.db.flush()
+        except IntegrityError:
+            # آپلود همزمان همین محتوا زودتر ثبت شده (stored_filename یکتا است)؛
+            # فایل روی دیسک متعلق به آن رکورد است و حذف نمی‌شود
+            if commit:
+                await self.db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="File already exists"
+            )
+        except Exception:
+            # فایل ذخیره‌شده بدون رکورد باقی نماند
+            if commit:
+                await self.db.rollback()
+            await asyncio.to_thread(Path(storage_path).unlink, missing_ok=True)
+            raise
+
+        # ثبت لاگ؛ همراه با رکورد فایل در یک commit
         await self._log_file_access(
             file_attachment.id,
             user.id,
             "upload",
             success=True
         )
+        if commit:
+            await self.db.commit()
 
         return file_attachment
 
@@ -137,8 +258,11 @@ class FileService:
             file_id: int,
             user: Optional[User] = None,
             check_permission: bool = True
-    ) -> Tuple[FileAttachment, bytes]:
-        """دانلود فایل با بررسی دسترسی"""
+    ) -> Tuple[FileAttachment, AsyncIterator[bytes]]:
+        """
+        دانلود فایل با بررسی دسترسی.
+        محتوا به صورت iterator تکه‌ای برگردانده می‌شود تا کل فایل در حافظه بارگذاری نشود.
+        """
 
         file_attachment = await self._get_file(file_id)
 
@@ -150,13 +274,18 @@ class FileService:
                     detail="Access denied to this file"
                 )
 
-        # خواندن فایل از storage
-        content = await self._read_file(file_attachment.storage_path)
+        path = file_attachment.storage_path
+        if not path or not os.path.exists(path):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="File not found in storage"
+            )
 
-        # رمزگشایی اگر رمزنگاری شده
+        # آماده‌سازی رمزگشای جریانی اگر فایل رمزنگاری شده
+        decryptor = None
         if file_attachment.is_encrypted:
             try:
-                content = self._decrypt_content(content)
+                decryptor = await self._create_decryptor(path)
             except Exception as e:
                 await self._log_file_access(
                     file_id,
@@ -165,26 +294,25 @@ class FileService:
                     success=False,
                     error_message=f"Decryption failed: {str(e)}"
                 )
+                await self.db.commit()
                 raise HTTPException(
                     status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                     detail="File decryption failed"
                 )
 
         # به‌روزرسانی آمار
-        file_attachment.download_count += 1
-        file_attachment.last_accessed_at = datetime.utcnow()
-        self.db.add(file_attachment)
-        await self.db.commit()
+        await self._increment_counter(file_id, FileAttachment.download_count)
 
-        # ثبت لاگ
+        # ثبت لاگ؛ همراه با آمار در یک commit
         await self._log_file_access(
             file_id,
             user.id if user else None,
             "download",
             success=True
         )
+        await self.db.commit()
 
-        return file_attachment, content
+        return file_attachment, self._iter_file(path, decryptor)
 
     async def get_file_info(
             self,
@@ -203,18 +331,16 @@ class FileService:
             )
 
         # به‌روزرسانی آمار بازدید
-        file_attachment.view_count += 1
-        file_attachment.last_accessed_at = datetime.utcnow()
-        self.db.add(file_attachment)
-        await self.db.commit()
+        await self._increment_counter(file_id, FileAttachment.view_count)
 
-        # ثبت لاگ
+        # ثبت لاگ؛ همراه با آمار در یک commit
         await self._log_file_access(
             file_id,
             user.id if user else None,
             "view",
             success=True
         )
+        await self.db.commit()
 
         return file_attachment
 
@@ -241,10 +367,8 @@ class FileService:
                 setattr(file_attachment, key, value)
 
         self.db.add(file_attachment)
-        await self.db.commit()
-        await self.db.refresh(file_attachment)
 
-        # ثبت لاگ
+        # ثبت لاگ؛ همراه با تغییرات در یک commit
         await self._log_file_access(
             file_id,
             user.id,
@@ -252,6 +376,7 @@ class FileService:
             success=True,
             data={"fields_updated": list(update_data.dict(exclude_unset=True).keys())}
         )
+        await self.db.commit()
 
         return file_attachment
 
@@ -276,7 +401,6 @@ class FileService:
             # soft delete
             file_attachment.is_active = False
             self.db.add(file_attachment)
-            await self.db.commit()
 
             result = {
                 "success": True,
@@ -292,7 +416,6 @@ class FileService:
 
                 # حذف رکورد دیتابیس
                 await self.db.delete(file_attachment)
-                await self.db.commit()
 
                 result = {
                     "success": True,
@@ -308,12 +431,13 @@ class FileService:
                     success=False,
                     error_message=str(e)
                 )
+                await self.db.commit()
                 raise HTTPException(
                     status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                     detail=f"Failed to delete file: {str(e)}"
                 )
 
-        # ثبت لاگ
+        # ثبت لاگ؛ همراه با حذف در یک commit
         await self._log_file_access(
             file_id,
             user.id,
@@ -321,6 +445,7 @@ class FileService:
             success=True,
             data={"soft_delete": soft_delete}
         )
+        await self.db.commit()
 
         return result
 
@@ -333,99 +458,41 @@ class FileService:
     ) -> Dict[str, Any]:
         """لیست فایل‌ها با فیلتر"""
 
-        query = select(FileAttachment).where(FileAttachment.is_active == True)
-
-        # اعمال فیلترها
-        conditions = []
-
-        if filters.file_type:
-            conditions.append(FileAttachment.file_type == filters.file_type)
-
-        if filters.access_level:
-            conditions.append(FileAttachment.access_level == filters.access_level)
-
-        if filters.entity_type:
-            conditions.append(FileAttachment.entity_type == filters.entity_type)
-
-        if filters.entity_id:
-            conditions.append(FileAttachment.entity_id == filters.entity_id)
-
-        if filters.uploaded_by:
-            conditions.append(FileAttachment.uploaded_by == filters.uploaded_by)
-
-        if filters.min_size:
-            conditions.append(FileAttachment.file_size >= filters.min_size)
-
-        if filters.max_size:
-            conditions.append(FileAttachment.file_size <= filters.max_size)
-
-        if filters.start_date:
-            conditions.append(FileAttachment.uploaded_at >= filters.start_date)
-
-        if filters.end_date:
-            conditions.append(FileAttachment.uploaded_at <= filters.end_date)
-
-        if filters.search_text:
-            conditions.append(
-                or_(
-                    FileAttachment.original_filename.ilike(f"%{filters.search_text}%"),
-                    FileAttachment.title.ilike(f"%{filters.search_text}%"),
-                    FileAttachment.description.ilike(f"%{filters.search_text}%")
-                )
-            )
-
-        if filters.tags:
-            # جستجو در فیلد JSON tags
-            for tag in filters.tags:
-                conditions.append(FileAttachment.tags.contains([tag]))
+        # مقدار فیلترهای ساده؛ فقط فیلترهای پر شده در ساختار کوئری می‌آیند
+        params = {
+            name: getattr(filters, name)
+            for name in _LIST_FILE_FILTERS
+            if getattr(filters, name)
+        }
+        if "search_text" in params:
+            params["search_text"] = f"%{params['search_text']}%"
+        # ساختار کوئری فقط به فیلترهای FileFilter بستگی دارد؛ پارامتر دسترسی جدا اضافه می‌شود
+        filter_names = tuple(params)
 
         # فیلترهای دسترسی
         if user:
-            user_roles = [r.key for r in user.roles]
-            is_admin = "ADMIN" in user_roles or "CHARITY_MANAGER" in user_roles
-
-            if not is_admin:
-                # کاربران عادی فقط فایل‌های عمومی، محافظت‌شده یا فایل‌های خودشان را می‌بینند
-                access_conditions = [
-                    FileAttachment.access_level.in_([FileAccessLevel.PUBLIC, FileAccessLevel.PROTECTED]),
-                    FileAttachment.uploaded_by == user.id
-                ]
-
-                # اگر کاربر نیازمند است، فایل‌های private خودش را هم می‌بیند
-                if "NEEDY" in user_roles:
-                    access_conditions.append(
-                        and_(
-                            FileAttachment.access_level == FileAccessLevel.PRIVATE,
-                            FileAttachment.uploaded_by == user.id
-                        )
-                    )
-
-                conditions.append(or_(*access_conditions))
+            user_roles = user.role_keys
+            if "ADMIN" in user_roles or "CHARITY_MANAGER" in user_roles:
+                access = "admin"
+            elif "NEEDY" in user_roles:
+                access = "needy"
+            else:
+                access = "user"
+            if access != "admin":
+                params["user_id"] = user.id
         else:
-            # کاربران مهمان فقط فایل‌های عمومی
-            conditions.append(FileAttachment.access_level == FileAccessLevel.PUBLIC)
+            access = "guest"
 
-        if conditions:
-            query = query.where(and_(*conditions))
-
-        # مرتب‌سازی
-        sort_column = getattr(FileAttachment, filters.sort_by, FileAttachment.uploaded_at)
-        if filters.sort_order == "desc":
-            query = query.order_by(sort_column.desc())
-        else:
-            query = query.order_by(sort_column.asc())
+        query = _list_files_statement(
+            filter_names, access, filters.sort_by, filters.sort_order == "desc"
+        )
 
-        # شمارش کل
-        total_query = select(func.count()).select_from(query.subquery())
-        total = await self.db.scalar(total_query)
+        if filters.tags:
+            # جستجو در فیلد JSON tags
+            query = query.where(*(FileAttachment.tags.contains([tag]) for tag in filters.tags))
 
-        # صفحه‌بندی
-        offset = (page - 1) * limit
-        query = query.offset(offset).limit(limit)
-
-        # اجرای کوئری
-        result = await self.db.execute(query)
-        files = result.scalars().all()
+        # صفحه‌بندی؛ تعداد کل با window function در همان کوئری محاسبه می‌شود
+        files, total = await self._fetch_page(query, page, limit, params)
 
         return {
             "items": files,
@@ -443,50 +510,51 @@ class FileService:
     ) -> Dict[str, Any]:
         """آمار فایل‌ها"""
 
-        query = select(FileAttachment).where(FileAttachment.is_active == True)
+        conditions = [FileAttachment.is_active == True]
 
         # فیلترهای اختیاری
         if entity_type:
-            query = query.where(FileAttachment.entity_type == entity_type)
+            conditions.append(FileAttachment.entity_type == entity_type)
         if entity_id:
-            query = query.where(FileAttachment.entity_id == entity_id)
+            conditions.append(FileAttachment.entity_id == entity_id)
 
         # فیلتر دسترسی
         if user:
             if not await self._is_admin(user):
-                query = query.where(
+                conditions.append(
                     or_(
                         FileAttachment.access_level.in_([FileAccessLevel.PUBLIC, FileAccessLevel.PROTECTED]),
                         FileAttachment.uploaded_by == user.id
                     )
                 )
 
-        result = await self.db.execute(query)
-        files = result.scalars().all()
+        # محاسبات آماری در دیتابیس؛ فقط نتایج تجمیعی منتقل می‌شوند
+        totals = (await self.db.execute(
+            select(func.count(FileAttachment.id), func.coalesce(func.sum(FileAttachment.file_size), 0))
+            .where(*conditions)
+        )).one()
 
-        # محاسبات آماری
         stats = {
-            "total_files": len(files),
-            "total_size": sum(f.file_size or 0 for f in files),
-            "by_file_type": {},
-            "by_access_level": {},
-            "by_entity_type": {}
-        }
-
-        for file in files:
+            "total_files": totals[0],
+            "total_size": totals[1],
             # شمارش بر اساس نوع فایل
-            stats["by_file_type"][file.file_type.value] = stats["by_file_type"].get(file.file_type.value, 0) + 1
-
+            "by_file_type": await self._count_files_by(FileAttachment.file_type, conditions),
             # شمارش بر اساس سطح دسترسی
-            stats["by_access_level"][file.access_level.value] = stats["by_access_level"].get(file.access_level.value,
-                                                                                             0) + 1
-
+            "by_access_level": await self._count_files_by(FileAttachment.access_level, conditions),
             # شمارش بر اساس موجودیت مرتبط
-            if file.entity_type:
-                stats["by_entity_type"][file.entity_type] = stats["by_entity_type"].get(file.entity_type, 0) + 1
+            "by_entity_type": await self._count_files_by(
+                FileAttachment.entity_type,
+                conditions + [FileAttachment.entity_type.is_not(None)]
+            ),
+        }
 
         # فایل‌های اخیر
-        recent_query = query.order_by(FileAttachment.uploaded_at.desc()).limit(10)
+        recent_query = (
+            select(FileAttachment)
+            .where(*conditions)
+            .order_by(FileAttachment.uploaded_at.desc())
+            .limit(10)
+        )
         recent_result = await self.db.execute(recent_query)
         stats["recent_uploads"] = recent_result.scalars().all()
 
@@ -510,19 +578,14 @@ class FileService:
                 detail="Not authorized to view access logs"
             )
 
-        query = select(FileAccessLog).where(FileAccessLog.file_id == file_id)
-
-        # شمارش کل
-        total_query = select(func.count()).select_from(query.subquery())
-        total = await self.db.scalar(total_query)
+        query = (
+            select(FileAccessLog)
+            .where(FileAccessLog.file_id == file_id)
+            .order_by(FileAccessLog.accessed_at.desc())
+        )
 
-        # صفحه‌بندی
-        offset = (page - 1) * limit
-        query = query.order_by(FileAccessLog.accessed_at.desc())
-        query = query.offset(offset).limit(limit)
-
-        result = await self.db.execute(query)
-        logs = result.scalars().all()
+        # صفحه‌بندی؛ تعداد کل با window function در همان کوئری محاسبه می‌شود
+        logs, total = await self._fetch_page(query, page, limit)
 
         return {
             "file_id": file_id,
@@ -557,34 +620,45 @@ class FileService:
         deleted_count = 0
         errors = []
 
-        for file in expired_files:
-            try:
-                # حذف فایل فیزیکی
-                await self._delete_physical_file(file.storage_path)
+        for start in range(0, len(expired_files), self.CLEANUP_BATCH_SIZE):
+            batch = expired_files[start:start + self.CLEANUP_BATCH_SIZE]
 
-                # حذف رکورد دیتابیس
-                await self.db.delete(file)
-
-                # ثبت لاگ
-                await self._log_file_access(
-                    file.id,
-                    user.id,
-                    "auto_delete",
-                    success=True,
-                    data={"reason": "file_expired"}
-                )
+            # حذف همزمان فایل‌های فیزیکی این دسته
+            results = await asyncio.gather(
+                *(self._delete_physical_file(file.storage_path) for file in batch),
+                return_exceptions=True
+            )
 
-                deleted_count += 1
+            deleted = []
+            for file, result in zip(batch, results):
+                if isinstance(result, Exception):
+                    errors.append({
+                        "file_id": file.id,
+                        "filename": file.original_filename,
+                        "error": str(result)
+                    })
+                else:
+                    deleted.append(file)
+
+            if not deleted:
+                continue
+
+            # حذف رکوردهای دیتابیس با یک کوئری
+            await self.db.execute(
+                delete(FileAttachment)
+                .where(FileAttachment.id.in_([file.id for file in deleted]))
+                .execution_options(synchronize_session=False)
+            )
 
-            except Exception as e:
-                errors.append({
-                    "file_id": file.id,
-                    "filename": file.original_filename,
-                    "error": str(e)
-                })
+            deleted_count += len(deleted)
 
         await self.db.commit()
 
+        # لاگ دسترسی فایل‌ها با حذف رکوردشان cascade می‌شود؛ پاک‌سازی در لاگ برنامه ثبت می‌شود
+        logger.info(
+            f"Expired file cleanup by user {user.id}: {deleted_count} deleted, {len(errors)} failed"
+        )
+
         return {
             "deleted_count": deleted_count,
             "errors": errors,
@@ -593,6 +667,41 @@ class FileService:
 
     # ---------- Helper Methods ----------
 
+    async def _fetch_page(
+            self,
+            query,
+            page: int,
+            limit: int,
+            params: Optional[Dict[str, Any]] = None
+    ) -> Tuple[List[Any], int]:
+        """اجرای یک صفحه از کوئری به همراه تعداد کل در یک رفت‌وبرگشت"""
+        paged = query.add_columns(func.count().over().label("total_count"))
+        paged = paged.offset((page - 1) * limit).limit(limit)
+        rows = (await self.db.execute(paged, params)).all()
+
+        if rows:
+            return [row[0] for row in rows], rows[0].total_count
+
+        # صفحه خالی: تعداد کل جداگانه (فقط وقتی صفحه خارج از محدوده است)
+        if page > 1:
+            total = await self.db.scalar(
+                select(func.count()).select_from(query.order_by(None).subquery()), params
+            )
+            return [], total or 0
+        return [], 0
+
+    async def _count_files_by(self, column, conditions: List[Any]) -> Dict[str, int]:
+        """شمارش فایل‌ها با GROUP BY روی یک ستون"""
+        result = await self.db.execute(
+            select(column, func.count(FileAttachment.id))
+            .where(*conditions)
+            .group_by(column)
+        )
+        return {
+            (key.value if hasattr(key, "value") else key): count
+            for key, count in result.all()
+        }
+
     async def _get_file(self, file_id: int) -> FileAttachment:
         """دریافت فایل با بررسی وجود"""
         file = await self.db.get(FileAttachment, file_id)
@@ -621,7 +730,7 @@ class FileService:
             return True
 
         # ادمین و مدیران خیریه
-        user_roles = [r.key for r in user.roles]
+        user_roles = user.role_keys
         if "ADMIN" in user_roles or "CHARITY_MANAGER" in user_roles:
             return True
 
@@ -646,14 +755,27 @@ class FileService:
 
     async def _check_file_ownership(self, file: FileAttachment, user: User) -> bool:
         """بررسی مالکیت فایل"""
-        user_roles = [r.key for r in user.roles]
+        user_roles = user.role_keys
         return file.uploaded_by == user.id or "ADMIN" in user_roles
 
     async def _is_admin(self, user: User) -> bool:
         """بررسی ادمین بودن"""
-        user_roles = [r.key for r in user.roles]
+        user_roles = user.role_keys
         return "ADMIN" in user_roles or "CHARITY_MANAGER" in user_roles
 
+    async def _increment_counter(self, file_id: int, column) -> None:
+        """
+        افزایش اتمی شمارنده در خود دیتابیس (counter = counter + 1)؛
+        بدون خواندن-تغییر-نوشتن، پس دانلودهای همزمان شمارش را گم نمی‌کنند.
+        شیء بارگذاری‌شده به‌روز نمی‌شود و آمار نمایش‌داده‌شده ممکن است یکی عقب باشد.
+        """
+        await self.db.execute(
+            update(FileAttachment)
+            .where(FileAttachment.id == file_id)
+            .values({column: column + 1, FileAttachment.last_accessed_at: func.now()})
+            .execution_options(synchronize_session=False)
+        )
+
     async def _log_file_access(
             self,
             file_id: int,
@@ -663,7 +785,7 @@ class FileService:
             error_message: Optional[str] = None,
             data: Optional[Dict] = None
     ):
-        """ثبت لاگ دسترسی"""
+        """ثبت لاگ دسترسی؛ commit بر عهده فراخواننده است تا لاگ همراه تغییرات اصلی ذخیره شود"""
 
         # در حالت واقعی IP و User-Agent از request می‌آیند
         log = FileAccessLog(
@@ -678,10 +800,13 @@ class FileService:
         )
 
         self.db.add(log)
-        await self.db.commit()
 
     def _get_file_type(self, mime_type: str, filename: str) -> FileType:
         """تعیین نوع فایل"""
+        file_type = _MIME_TO_TYPE.get(mime_type)
+        if file_type is not None:
+            return file_type
+
         if mime_type.startswith("image/"):
             return FileType.IMAGE
         elif mime_type == "application/pdf":
@@ -693,35 +818,76 @@ class FileService:
 
     def _is_mime_type_allowed(self, mime_type: str, file_type: FileType) -> bool:
         """بررسی مجاز بودن نوع فایل"""
-        if file_type == FileType.IMAGE:
-            return mime_type in self.allowed_mime_types["image"]
-        elif file_type == FileType.DOCUMENT or file_type == FileType.PDF:
-            return mime_type in self.allowed_mime_types["document"]
-        elif file_type == FileType.OTHER:
+        if file_type == FileType.OTHER:
             # فایل‌های دیگر با احتیاط
             return True
-        return False
+        return mime_type in _MIME_TO_TYPE
+
+    async def _stream_to_temp(self, file: UploadFile, encrypt: bool = False) -> Tuple[str, str, int]:
+        """
+        ذخیره فایل آپلودی در پوشه موقت به صورت تکه‌تکه.
+        hash، حجم و در صورت نیاز رمزنگاری همزمان با نوشتن انجام می‌شوند تا کل فایل در حافظه نماند.
+        خروجی: مسیر فایل موقت، hash (BLAKE2b) محتوای اصلی، حجم ذخیره‌شده
+        """
+        temp_path = str(self.temp_path / uuid.uuid4().hex)
+        hasher = hashlib.blake2b(digest_size=32)
+        file_size = 0
+        stored_size = 0
 
-    def _calculate_file_hash(self, content: bytes) -> str:
-        """محاسبه هش فایل"""
-        return hashlib.sha256(content).hexdigest()
-
-    def _get_storage_path(self, file_type: FileType, filename: str) -> str:
-        """تعیین مسیر ذخیره‌سازی"""
-        # ایجاد پوشه بر اساس نوع و تاریخ
-        date_str = datetime.utcnow().strftime("%Y/%m/%d")
-        type_folder = file_type.value
-        full_path = Path(self.storage_path) / type_folder / date_str
+        try:
+            async with aiofiles.open(temp_path, "wb") as f:
+                encryptor = None
+                if encrypt:
+                    # قالب فایل رمز شده: nonce + متن رمز + tag
+                    nonce = secrets.token_bytes(self.NONCE_SIZE)
+                    encryptor = Cipher(algorithms.AES(self.encryption_key), modes.GCM(nonce)).encryptor()
+                    await f.write(nonce)
+                    stored_size += len(nonce)
+
+                while chunk := await file.read(self.CHUNK_SIZE):
+                    file_size += len(chunk)
+                    if file_size > self.max_file_size:
+                        raise HTTPException(
+                            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                            detail=f"File size exceeds limit: {self.max_file_size // (1024 * 1024)}MB"
+                        )
+                    # hashlib و OpenSSL هنگام پردازش تکه‌های بزرگ GIL را آزاد می‌کنند؛
+                    # با اجرای آن در thread، آپلودهای همزمان روی چند هسته موازی hash می‌شوند
+                    chunk = await _run_crypto(self._process_chunk, hasher, encryptor, chunk)
+                    await f.write(chunk)
+                    stored_size += len(chunk)
+
+                if encryptor:
+                    tail = encryptor.finalize() + encryptor.tag
+                    await f.write(tail)
+                    stored_size += len(tail)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        return temp_path, f"{self.HASH_PREFIX}{hasher.hexdigest()}", stored_size
+
+    def _get_storage_path(self, stored_filename: str) -> str:
+        """تعیین مسیر ذخیره‌سازی: objects/ab/cd/<hash> بر اساس hash محتوا"""
+        full_path = Path(self.storage_path) / "objects" / stored_filename[:2] / stored_filename[2:4]
 
         # ایجاد پوشه‌ها اگر وجود ندارند
-        full_path.mkdir(parents=True, exist_ok=True)
-
-        return str(full_path / filename)
-
-    def _get_extension_from_mime(self, mime_type: str) -> str:
-        """گرفتن پسوند از mime type"""
-        ext = mimetypes.guess_extension(mime_type)
-        return ext or ".bin"
+        self._ensure_dir(full_path)
+
+        return str(full_path / stored_filename)
+
+    @classmethod
+    def _ensure_dir(cls, path: Path) -> None:
+        """
+        ایجاد پوشه فقط بار اول در این پروسه؛ پوشه‌های ساخته‌شده در سطح کلاس نگه داشته می‌شوند
+        چون FileService برای هر درخواست از نو ساخته می‌شود.
+        """
+        key = str(path)
+        if key in cls._created_dirs:
+            return
+        path.mkdir(parents=True, exist_ok=True)
+        cls._created_dirs.add(key)
 
     async def _save_file(self, path: str, content: bytes):
         """ذخیره فایل در storage"""
@@ -731,30 +897,82 @@ class FileService:
         async with aiofiles.open(path, "wb") as f:
             await f.write(content)
 
-    async def _read_file(self, path: str) -> bytes:
-        """خواندن فایل از storage"""
-        try:
-            async with aiofiles.open(path, "rb") as f:
-                return await f.read()
-        except FileNotFoundError:
+    @staticmethod
+    def _process_chunk(hasher, encryptor, chunk: bytes) -> bytes:
+        """به‌روزرسانی hash و رمزنگاری یک تکه از فایل"""
+        hasher.update(chunk)
+        if encryptor:
+            return encryptor.update(chunk)
+        return chunk
+
+    def _require_encryption_key(self) -> None:
+        """خطا در صورت تنظیم نبودن کلید رمزنگاری فایل"""
+        if self.encryption_key is None:
             raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="File not found in storage"
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="File encryption key is not configured"
             )
 
+    async def _create_decryptor(self, path: str):
+        """ساخت رمزگشای AES-GCM از nonce ابتدای فایل و tag انتهای آن"""
+        self._require_encryption_key()
+        async with aiofiles.open(path, "rb") as f:
+            nonce = await f.read(self.NONCE_SIZE)
+            await f.seek(-self.TAG_SIZE, os.SEEK_END)
+            tag = await f.read(self.TAG_SIZE)
+        if len(nonce) != self.NONCE_SIZE or len(tag) != self.TAG_SIZE:
+            raise ValueError("Encrypted file is truncated")
+        return Cipher(algorithms.AES(self.encryption_key), modes.GCM(nonce, tag)).decryptor()
+
+    async def _iter_file(self, path: str, decryptor=None) -> AsyncIterator[bytes]:
+        """
+        خواندن تکه‌تکه فایل از storage (و رمزگشایی در صورت نیاز).
+        صحت tag در انتهای جریان بررسی می‌شود و در صورت خطا جریان قطع می‌شود.
+        """
+        async with aiofiles.open(path, "rb") as f:
+            if decryptor is None:
+                while chunk := await f.read(self.CHUNK_SIZE):
+                    yield chunk
+                return
+
+            await f.seek(0, os.SEEK_END)
+            remaining = await f.tell() - self.NONCE_SIZE - self.TAG_SIZE
+            await f.seek(self.NONCE_SIZE)
+            while remaining > 0:
+                chunk = await f.read(min(self.CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield await _run_crypto(decryptor.update, chunk)
+            final = decryptor.finalize()
+            if final:
+                yield final
+
+    def get_content_length(self, file_attachment: FileAttachment) -> int:
+        """حجم محتوای قابل دانلود (برای فایل رمز شده بدون nonce و tag)"""
+        size = file_attachment.file_size or 0
+        if file_attachment.is_encrypted:
+            size -= self.NONCE_SIZE + self.TAG_SIZE
+        return max(size, 0)
+
+    async def discard_stored_files(self, storage_paths: List[str]) -> None:
+        """
+        حذف فایل‌های روی دیسک یک آپلود ناموفق (بعد از rollback)؛
+        مسیرهایی که رکورد دیگری هنوز به آن‌ها اشاره دارد (محتوای مشترک) نگه داشته می‌شوند
+        """
+        if not storage_paths:
+            return
+        in_use = set(await self.db.scalars(
+            select(FileAttachment.storage_path).where(FileAttachment.storage_path.in_(storage_paths))
+        ))
+        await asyncio.gather(
+            *(self._delete_physical_file(path) for path in set(storage_paths) - in_use),
+            return_exceptions=True
+        )
+
     async def _delete_physical_file(self, path: str):
         """حذف فایل فیزیکی"""
         try:
-            path_obj = Path(path)
-            if path_obj.exists():
-                path_obj.unlink()
+            await asyncio.to_thread(Path(path).unlink, missing_ok=True)
         except Exception as e:
             raise Exception(f"Failed to delete physical file: {str(e)}")
-
-    def _encrypt_content(self, content: bytes) -> bytes:
-        """رمزنگاری محتوای فایل"""
-        return self.cipher.encrypt(content)
-
-    def _decrypt_content(self, encrypted_content: bytes) -> bytes:
-        """رمزگشایی محتوای فایل"""
-        return self.cipher.decrypt(encrypted_content)
\ No newline at end of file
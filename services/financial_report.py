@@ -1,22 +1,54 @@
 # app/services/financial_report.py - فایل کامل
 
+import asyncio
+import json
+from contextlib import asynccontextmanager
+
+from fastapi import HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_, func, desc
-from datetime import datetime, timedelta
-from typing import Dict, Any, List, Optional
+from sqlalchemy import select, or_, func, desc, literal, union_all, text
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Optional, Tuple
 from collections import defaultdict
 
+from core.cache import get_cache, set_cache, delete_cache_prefix
+from core.database import AsyncSessionLocal, IS_POSTGRESQL
 from models.order import Order
 from models.donation import Donation
 from models.charity import Charity
 from models.need_ad import NeedAd
+from models.monthly_charity_financials import MonthlyCharityFinancials
+
+
+# وضعیت سفارش‌هایی که سهم خیریه‌شان درآمد حساب می‌شود
+_PAID_ORDER_STATUSES = ("delivered", "confirmed")
+# وضعیت نیازهای در جریان
+_OPEN_NEED_STATUSES = ("pending", "active")
+
+
+def _empty_month() -> Dict[str, float]:
+    """مقادیر ماهی که هیچ تراکنشی ندارد"""
+    return {"donations": 0.0, "sales": 0.0, "expenses": 0.0}
+
+
+def _year_range(year: int) -> Tuple[datetime, datetime]:
+    """بازه نیمه‌باز [ابتدای سال، ابتدای سال بعد) به وقت UTC؛ روز آخر سال هم کامل حساب می‌شود"""
+    return datetime(year, 1, 1, tzinfo=timezone.utc), datetime(year + 1, 1, 1, tzinfo=timezone.utc)
 
 
 class FinancialReportService:
     """سرویس گزارش‌های مالی پیشرفته"""
 
-    def __init__(self, db: AsyncSession):
+    # مدت نگهداری گزارش‌ها در کش (ثانیه)
+    REPORT_CACHE_TTL = 60 * 60
+    CLOSED_YEAR_CACHE_TTL = 24 * 60 * 60
+    CACHE_PREFIX = "fin:"
+
+    def __init__(self, db: AsyncSession, session_factory=AsyncSessionLocal):
         self.db = db
+        # کوئری‌های مستقل گزارش هر کدام با session کوتاه‌عمر خودشان همزمان اجرا می‌شوند؛
+        # یک AsyncSession روی یک اتصال است و کوئری‌های همزمان را نمی‌پذیرد
+        self.session_factory = session_factory
 
     async def generate_income_statement(
             self,
@@ -28,96 +60,67 @@ class FinancialReportService:
         - درآمدها: کمک‌های مستقیم، فروش محصولات، مشارکت‌ها
         - هزینه‌ها: کمک به نیازمندان، هزینه‌های عملیاتی (در صورت وجود)
         """
+        # سال‌های بسته‌شده فقط با refresh شبانه نمای تجمیعی تغییر می‌کنند
+        ttl = self.CLOSED_YEAR_CACHE_TTL if year < datetime.utcnow().year else self.REPORT_CACHE_TTL
+        return await self._cached(
+            f"{self.CACHE_PREFIX}income:{year}:{charity_id}",
+            ttl,
+            lambda: self._build_income_statement(year, charity_id)
+        )
 
-        start_date = datetime(year, 1, 1)
-        end_date = datetime(year, 12, 31)
+    async def generate_income_statements_bulk(
+            self,
+            year: int,
+            charity_ids: List[int]
+    ) -> Dict[int, Dict[str, Any]]:
+        """
+        صورت سود و زیان سالانه چند خیریه با یک کوئری گروه‌بندی‌شده بر اساس خیریه و ماه،
+        به‌جای فراخوانی generate_income_statement در حلقه (برای داشبورد ادمین)
+        """
+        if not charity_ids:
+            return {}
 
-        # ========== 1. درآمدها ==========
+        by_charity = await self._income_by_month(year, charity_ids, per_charity=True)
+        return {
+            charity_id: self._assemble_income_statement(year, charity_id, by_charity[charity_id])
+            for charity_id in charity_ids
+        }
 
-        # کمک‌های مستقیم
-        donations_query = select(func.coalesce(func.sum(Donation.amount), 0)).where(
-            and_(
-                Donation.created_at.between(start_date, end_date),
-                Donation.status == "completed"
-            )
-        )
-        if charity_id:
-            donations_query = donations_query.where(Donation.charity_id == charity_id)
-        total_donations = await self.db.scalar(donations_query) or 0
+    async def _build_income_statement(self, year: int, charity_id: Optional[int]) -> Dict[str, Any]:
+        """محاسبه صورت سود و زیان (بدون کش)"""
+        by_charity = await self._income_by_month(year, [charity_id] if charity_id else None)
+        return self._assemble_income_statement(year, charity_id, by_charity[None])
 
-        # فروش محصولات (سهم خیریه)
-        orders_query = select(func.coalesce(func.sum(Order.charity_amount), 0)).where(
-            and_(
-                Order.created_at.between(start_date, end_date),
-                Order.status.in_(["delivered", "confirmed"])
-            )
-        )
-        if charity_id:
-            orders_query = orders_query.where(Order.charity_id == charity_id)
-        total_sales_charity = await self.db.scalar(orders_query) or 0
+    def _assemble_income_statement(
+            self,
+            year: int,
+            charity_id: Optional[int],
+            by_month: Dict[int, Dict[str, float]]
+    ) -> Dict[str, Any]:
+        """ساخت صورت سود و زیان از جمع‌های ماهانه درآمد و هزینه"""
 
-        # ========== 2. هزینه‌ها ==========
-        # مبلغ پرداخت شده به نیازمندان
-        needs_paid_query = select(func.coalesce(func.sum(NeedAd.collected_amount), 0)).where(
-            and_(
-                NeedAd.updated_at.between(start_date, end_date),
-                NeedAd.status == "completed"
-            )
-        )
-        if charity_id:
-            needs_paid_query = needs_paid_query.where(NeedAd.charity_id == charity_id)
-        total_needs_paid = await self.db.scalar(needs_paid_query) or 0
+        # ========== 1. درآمدها و هزینه‌ها ==========
+        total_donations, total_sales_charity, total_needs_paid = self._yearly_totals(by_month)
 
-        # ========== 3. آمار ماهانه ==========
+        # ========== 2. آمار ماهانه ==========
         monthly_stats = []
         for month in range(1, 13):
-            month_start = datetime(year, month, 1)
-            if month == 12:
-                month_end = datetime(year, 12, 31)
-            else:
-                month_end = datetime(year, month + 1, 1) - timedelta(days=1)
-
-            # درآمد ماه
-            month_donations = await self.db.scalar(
-                select(func.coalesce(func.sum(Donation.amount), 0)).where(
-                    and_(
-                        Donation.created_at.between(month_start, month_end),
-                        Donation.status == "completed"
-                    )
-                )
-            ) or 0
-
-            month_sales = await self.db.scalar(
-                select(func.coalesce(func.sum(Order.charity_amount), 0)).where(
-                    and_(
-                        Order.created_at.between(month_start, month_end),
-                        Order.status.in_(["delivered", "confirmed"])
-                    )
-                )
-            ) or 0
-
-            # هزینه ماه
-            month_expenses = await self.db.scalar(
-                select(func.coalesce(func.sum(NeedAd.collected_amount), 0)).where(
-                    and_(
-                        NeedAd.updated_at.between(month_start, month_end),
-                        NeedAd.status == "completed"
-                    )
-                )
-            ) or 0
+            month_donations = by_month[month]["donations"]
+            month_sales = by_month[month]["sales"]
+            month_expenses = by_month[month]["expenses"]
 
             monthly_stats.append({
                 "month": month,
-                "donations": float(month_donations),
-                "sales_charity": float(month_sales),
-                "total_income": float(month_donations + month_sales),
-                "expenses": float(month_expenses),
-                "net_profit": float(month_donations + month_sales - month_expenses)
+                "donations": month_donations,
+                "sales_charity": month_sales,
+                "total_income": month_donations + month_sales,
+                "expenses": month_expenses,
+                "net_profit": month_donations + month_sales - month_expenses
             })
 
-        # ========== 4. محاسبه شاخص‌ها ==========
-        total_income = float(total_donations + total_sales_charity)
-        total_expenses = float(total_needs_paid)
+        # ========== 3. محاسبه شاخص‌ها ==========
+        total_income = total_donations + total_sales_charity
+        total_expenses = total_needs_paid
         net_profit = total_income - total_expenses
 
         # درصد هزینه‌ها از درآمد
@@ -127,12 +130,12 @@ class FinancialReportService:
             "year": year,
             "charity_id": charity_id,
             "income": {
-                "direct_donations": float(total_donations),
-                "sales_contributions": float(total_sales_charity),
+                "direct_donations": total_donations,
+                "sales_contributions": total_sales_charity,
                 "total_income": total_income
             },
             "expenses": {
-                "needs_payments": float(total_needs_paid),
+                "needs_payments": total_needs_paid,
                 "total_expenses": total_expenses
             },
             "net_profit": net_profit,
@@ -154,14 +157,12 @@ class FinancialReportService:
         if not charity:
             raise HTTPException(status_code=404, detail="خیریه یافت نشد")
 
-        # صورت سود و زیان
-        income_statement = await self.generate_income_statement(year, charity_id)
-
-        # آمار نیازها
-        needs_stats = await self._get_charity_needs_stats(charity_id, year)
-
-        # آمار کمک‌کنندگان
-        donors_stats = await self._get_charity_donors_stats(charity_id, year)
+        # صورت سود و زیان، آمار نیازها و آمار کمک‌کنندگان به صورت همزمان
+        income_statement, needs_stats, donors_stats = await asyncio.gather(
+            self.generate_income_statement(year, charity_id),
+            self._get_charity_needs_stats(charity_id, year),
+            self._get_charity_donors_stats(charity_id, year)
+        )
 
         return {
             "charity_id": charity_id,
@@ -175,12 +176,20 @@ class FinancialReportService:
 
     async def generate_public_financial_report(
             self,
-            period: str = "monthly"  # monthly, quarterly, yearly
+            period: str = "monthly"  # monthly, quarterly, yearly, all
     ) -> Dict[str, Any]:
         """
         گزارش مالی عمومی - بدون اطلاعات محرمانه
         قابل انتشار برای همه کاربران
         """
+        return await self._cached(
+            f"{self.CACHE_PREFIX}public:{period}",
+            self.REPORT_CACHE_TTL,
+            lambda: self._build_public_financial_report(period)
+        )
+
+    async def _build_public_financial_report(self, period: str) -> Dict[str, Any]:
+        """محاسبه گزارش مالی عمومی (بدون کش)"""
 
         end_date = datetime.utcnow()
 
@@ -190,113 +199,104 @@ class FinancialReportService:
             start_date = end_date - timedelta(days=90)
         elif period == "yearly":
             start_date = end_date - timedelta(days=365)
+        elif period == "all":
+            # کل دوره فعالیت، بدون محدودیت تاریخ
+            start_date = None
         else:
             start_date = end_date - timedelta(days=30)
 
+        def in_period(column):
+            return [] if start_date is None else [column.between(start_date, end_date)]
+
         # ========== آمار کلی ==========
 
         # کل کمک‌ها
         total_donations = await self.db.scalar(
             select(func.coalesce(func.sum(Donation.amount), 0)).where(
-                and_(
-                    Donation.created_at.between(start_date, end_date),
-                    Donation.status == "completed"
-                )
+                *in_period(Donation.created_at),
+                Donation.status == "completed"
             )
         ) or 0
 
         # کل کمک از فروش محصولات
         total_sales_contribution = await self.db.scalar(
             select(func.coalesce(func.sum(Order.charity_amount), 0)).where(
-                and_(
-                    Order.created_at.between(start_date, end_date),
-                    Order.status.in_(["delivered", "confirmed"])
-                )
+                *in_period(Order.created_at),
+                Order.status.in_(_PAID_ORDER_STATUSES)
             )
         ) or 0
 
         # تعداد نیازهای تأمین شده
         completed_needs = await self.db.scalar(
             select(func.count(NeedAd.id)).where(
-                and_(
-                    NeedAd.updated_at.between(start_date, end_date),
-                    NeedAd.status == "completed"
-                )
+                *in_period(NeedAd.updated_at),
+                NeedAd.status == "completed"
             )
         ) or 0
 
         # تعداد خیریه‌های فعال
         active_charities = await self.db.scalar(
-            select(func.count(Charity.id)).where(Charity.is_active == True)
+            select(func.count(Charity.id)).where(Charity.active.is_(True))
         ) or 0
 
         # ========== روند ماهانه ==========
-        monthly_trend = []
-        for i in range(6):  # 6 ماه اخیر
-            month_end = end_date - timedelta(days=30 * i)
-            month_start = month_end - timedelta(days=30)
-
-            month_donations = await self.db.scalar(
-                select(func.coalesce(func.sum(Donation.amount), 0)).where(
-                    and_(
-                        Donation.created_at.between(month_start, month_end),
-                        Donation.status == "completed"
-                    )
-                )
-            ) or 0
-
-            month_sales = await self.db.scalar(
-                select(func.coalesce(func.sum(Order.charity_amount), 0)).where(
-                    and_(
-                        Order.created_at.between(month_start, month_end),
-                        Order.status.in_(["delivered", "confirmed"])
-                    )
-                )
-            ) or 0
+        # ۶ ماه تقویمی اخیر (از قدیم به جدید) با یک کوئری UNION ALL گروه‌بندی‌شده بر اساس ماه
+        year, month = end_date.year, end_date.month
+        trend_months = []
+        for _ in range(6):
+            trend_months.append((year, month))
+            year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+        trend_months.reverse()
+        trend_start = datetime(trend_months[0][0], trend_months[0][1], 1)
+
+        trend_query = union_all(
+            self._monthly_sum_query(
+                "donations", Donation.amount, Donation.created_at,
+                [Donation.created_at.between(trend_start, end_date), Donation.status == "completed"]
+            ),
+            self._monthly_sum_query(
+                "sales", Order.charity_amount, Order.created_at,
+                [Order.created_at.between(trend_start, end_date), Order.status.in_(_PAID_ORDER_STATUSES)]
+            )
+        )
+        trend_by_month = defaultdict(lambda: {"donations": 0.0, "sales": 0.0})
+        for row in await self._all(trend_query):
+            trend_by_month[(int(row.year), int(row.month))][row.source] = float(row.total)
 
+        monthly_trend = []
+        for year, month in trend_months:
+            month_donations = trend_by_month[(year, month)]["donations"]
+            month_sales = trend_by_month[(year, month)]["sales"]
             monthly_trend.append({
-                "period": month_start.strftime("%Y-%m"),
-                "donations": float(month_donations),
-                "sales_contribution": float(month_sales),
-                "total": float(month_donations + month_sales)
+                "period": f"{year}-{month:02d}",
+                "donations": month_donations,
+                "sales_contribution": month_sales,
+                "total": month_donations + month_sales
             })
 
-        monthly_trend.reverse()  # از قدیم به جدید
-
         # ========== خیریه‌های برتر ==========
-        top_charities_query = (
-            select(
-                Charity.id,
-                Charity.name,
-                func.coalesce(func.sum(Donation.amount), 0).label("donations"),
-                func.coalesce(func.sum(Order.charity_amount), 0).label("sales")
-            )
-            .join(Donation, Donation.charity_id == Charity.id, isouter=True)
-            .join(Order, Order.charity_id == Charity.id, isouter=True)
-            .where(
-                and_(
-                    Donation.created_at.between(start_date, end_date),
-                    Donation.status == "completed"
-                )
+        if start_date is None:
+            # کل دوره: رتبه‌بندی روی جمع‌های نگه‌داشته‌شده در جدول خیریه (ایندکس ix_charities_rank)،
+            # بدون اسکن کمک‌ها و سفارش‌ها
+            ranked_total = Charity.total_donations_cached + Charity.total_sales_cached
+            top_charities_query = (
+                select(Charity.id, Charity.name, ranked_total.label("total"))
+                .where(Charity.active, ranked_total > 0)
+                .order_by(desc(ranked_total))
+                .limit(5)
             )
-            .group_by(Charity.id, Charity.name)
-            .order_by(desc("donations"))
-            .limit(5)
-        )
-
-        top_charities_result = await self.db.execute(top_charities_query)
-        top_charities = []
-        for row in top_charities_result:
-            top_charities.append({
-                "id": row.id,
-                "name": row.name,
-                "total_received": float(row.donations + row.sales)
-            })
+            top_charities = [
+                {"id": row.id, "name": row.name, "total_received": float(row.total)}
+                for row in await self._all(top_charities_query)
+            ]
+        else:
+            # جمع‌های نگه‌داشته‌شده مادام‌العمر هستند؛ برای بازه محدود مستقیم تجمیع می‌شود
+            top_charities = await self.get_top_charities_for_period(start_date, end_date)
 
         return {
             "period": period,
             "date_range": {
-                "start": start_date.isoformat(),
+                "start": start_date.isoformat() if start_date else None,
                 "end": end_date.isoformat()
             },
             "summary": {
@@ -311,27 +311,250 @@ class FinancialReportService:
             "generated_at": datetime.utcnow().isoformat()
         }
 
-    async def _get_charity_needs_stats(self, charity_id: int, year: int) -> Dict[str, Any]:
-        """آمار نیازهای یک خیریه"""
+    async def get_top_charities_for_period(
+            self,
+            start_date: datetime,
+            end_date: datetime,
+            limit: int = 5
+    ) -> List[Dict[str, Any]]:
+        """
+        خیریه‌های برتر در یک بازه زمانی دلخواه (برای داشبورد ادمین)؛
+        برخلاف گزارش عمومی، کمک‌ها و سفارش‌های بازه را مستقیم تجمیع می‌کند
+        """
+        # هر منبع جدا تجمیع و سپس به خیریه join می‌شود؛ join مستقیم کمک‌ها و سفارش‌ها
+        # هر کمک را در تعداد سفارش‌ها ضرب می‌کرد (و برعکس)
+        donations_sub = (
+            select(Donation.charity_id.label("charity_id"), func.sum(Donation.amount).label("total"))
+            .where(
+                Donation.created_at.between(start_date, end_date),
+                Donation.status == "completed"
+            )
+            .group_by(Donation.charity_id)
+            .subquery()
+        )
+        sales_sub = (
+            select(Order.charity_id.label("charity_id"), func.sum(Order.charity_amount).label("total"))
+            .where(
+                Order.created_at.between(start_date, end_date),
+                Order.status.in_(_PAID_ORDER_STATUSES)
+            )
+            .group_by(Order.charity_id)
+            .subquery()
+        )
+        donations_total = func.coalesce(donations_sub.c.total, 0)
+        sales_total = func.coalesce(sales_sub.c.total, 0)
+
+        top_charities_query = (
+            select(
+                Charity.id,
+                Charity.name,
+                donations_total.label("donations"),
+                sales_total.label("sales")
+            )
+            .join(donations_sub, donations_sub.c.charity_id == Charity.id, isouter=True)
+            .join(sales_sub, sales_sub.c.charity_id == Charity.id, isouter=True)
+            .where(or_(donations_sub.c.total.is_not(None), sales_sub.c.total.is_not(None)))
+            .order_by(desc(donations_total + sales_total))
+            .limit(limit)
+        )
+
+        top_charities_result = await self._all(top_charities_query)
+        top_charities = []
+        for row in top_charities_result:
+            top_charities.append({
+                "id": row.id,
+                "name": row.name,
+                "total_received": float(row.donations + row.sales)
+            })
+
+        return top_charities
+
+    async def _income_by_month(
+            self,
+            year: int,
+            charity_ids: Optional[List[int]],
+            per_charity: bool = False
+    ) -> Dict[Optional[int], Dict[int, Dict[str, float]]]:
+        """
+        جمع ماهانه کمک‌ها، فروش و هزینه‌ها (float)؛ سال‌های گذشته از جدول تجمیعی شبانه،
+        سال جاری به صورت زنده. charity_ids=None یعنی همه خیریه‌ها.
+        کلید خروجی شناسه خیریه است اگر per_charity، وگرنه None برای جمع همه
+        """
+        by_charity = defaultdict(lambda: defaultdict(_empty_month))
+        # نمای تجمیعی فقط روی PostgreSQL ساخته می‌شود؛ در غیر این صورت همه سال‌ها زنده محاسبه می‌شوند
+        if IS_POSTGRESQL and year < datetime.utcnow().year:
+            for row in await self._all(self._rollup_monthly_query(year, charity_ids, per_charity)):
+                by_charity[row.charity_id if per_charity else None][row.month.month] = {
+                    "donations": float(row.donations or 0),
+                    "sales": float(row.sales or 0),
+                    "expenses": float(row.expenses or 0)
+                }
+        else:
+            for row in await self._all(self._live_monthly_query(year, charity_ids, per_charity)):
+                month = by_charity[row.charity_id if per_charity else None][int(row.month)]
+                month[row.source] = float(row.total)
+        return by_charity
+
+    def _live_monthly_query(self, year: int, charity_ids: Optional[List[int]], per_charity: bool):
+        """
+        جمع ماهانه هر سه منبع مستقیم از جدول‌های اصلی، با یک کوئری UNION ALL از سه GROUP BY ماه
+        (و خیریه، اگر per_charity)
+        """
+
+        start_date, end_date = _year_range(year)
 
-        start_date = datetime(year, 1, 1)
-        end_date = datetime(year, 12, 31)
+        # کمک‌های مستقیم
+        donation_conditions = [
+            Donation.created_at >= start_date,
+            Donation.created_at < end_date,
+            Donation.status == "completed"
+        ]
+        # فروش محصولات (سهم خیریه)
+        order_conditions = [
+            Order.created_at >= start_date,
+            Order.created_at < end_date,
+            Order.status.in_(_PAID_ORDER_STATUSES)
+        ]
+        # مبلغ پرداخت شده به نیازمندان
+        need_conditions = [
+            NeedAd.updated_at >= start_date,
+            NeedAd.updated_at < end_date,
+            NeedAd.status == "completed"
+        ]
+        if charity_ids:
+            donation_conditions.append(Donation.charity_id.in_(charity_ids))
+            order_conditions.append(Order.charity_id.in_(charity_ids))
+            need_conditions.append(NeedAd.charity_id.in_(charity_ids))
+
+        return union_all(
+            self._monthly_sum_query(
+                "donations", Donation.amount, Donation.created_at, donation_conditions,
+                Donation.charity_id if per_charity else None
+            ),
+            self._monthly_sum_query(
+                "sales", Order.charity_amount, Order.created_at, order_conditions,
+                Order.charity_id if per_charity else None
+            ),
+            self._monthly_sum_query(
+                "expenses", NeedAd.collected_amount, NeedAd.updated_at, need_conditions,
+                NeedAd.charity_id if per_charity else None
+            )
+        )
 
-        query = select(NeedAd).where(
-            and_(
-                NeedAd.charity_id == charity_id,
-                NeedAd.created_at.between(start_date, end_date)
+    @staticmethod
+    def _rollup_monthly_query(year: int, charity_ids: Optional[List[int]], per_charity: bool):
+        """جمع ماهانه درآمد و هزینه از نمای تجمیعی monthly_charity_financials"""
+        start_date, end_date = _year_range(year)
+        mcf = MonthlyCharityFinancials
+        group_columns = [mcf.charity_id, mcf.month] if per_charity else [mcf.month]
+        query = (
+            select(
+                *group_columns,
+                func.sum(mcf.donations).label("donations"),
+                func.sum(mcf.sales).label("sales"),
+                func.sum(mcf.expenses).label("expenses")
             )
+            .where(mcf.month >= start_date, mcf.month < end_date)
+            .group_by(*group_columns)
         )
-        result = await self.db.execute(query)
-        needs = result.scalars().all()
+        if charity_ids:
+            query = query.where(mcf.charity_id.in_(charity_ids))
+        return query
+
+    @staticmethod
+    def _yearly_totals(by_month: Dict[int, Dict[str, Any]]) -> Tuple[Any, Any, Any]:
+        """جمع سالانه کمک‌ها، فروش و هزینه‌ها از مقادیر ماهانه"""
+        return tuple(sum((m[key] for m in by_month.values()), 0.0) for key in ("donations", "sales", "expenses"))
+
+    async def refresh_monthly_rollup(self) -> None:
+        """به‌روزرسانی نمای تجمیعی ماهانه؛ بدون قفل خواندن گزارش‌ها (اجرای شبانه)"""
+        if not IS_POSTGRESQL:
+            return
+        await self.db.execute(text("REFRESH MATERIALIZED VIEW CONCURRENTLY monthly_charity_financials"))
+        await self.db.commit()
+
+    @staticmethod
+    def _monthly_sum_query(source: str, amount_column, date_column, conditions: List[Any], charity_column=None):
+        """
+        کوئری جمع مبلغ به تفکیک ماه، با برچسب منبع برای ترکیب در UNION ALL؛
+        با charity_column به تفکیک خیریه هم گروه‌بندی می‌شود. سال و ماه با extract جدا می‌شوند
+        که روی PostgreSQL و SQLite هر دو کار می‌کند
+        """
+        year = func.extract("year", date_column)
+        month = func.extract("month", date_column)
+        charity = [] if charity_column is None else [charity_column]
+        return (
+            select(
+                literal(source).label("source"),
+                *(column.label("charity_id") for column in charity),
+                year.label("year"),
+                month.label("month"),
+                func.coalesce(func.sum(amount_column), 0).label("total")
+            )
+            .where(*conditions)
+            .group_by(*charity, year, month)
+        )
+
+    @classmethod
+    async def invalidate_cache(cls):
+        """پاک کردن گزارش‌های مالی کش‌شده (بعد از تغییر وضعیت کمک، سفارش یا نیاز)"""
+        await delete_cache_prefix(cls.CACHE_PREFIX)
+
+    async def _cached(self, key: str, ttl: int, build) -> Dict[str, Any]:
+        """برگرداندن گزارش از کش، یا ساختن و ذخیره آن برای ttl ثانیه"""
+        cached = await get_cache(key)
+        if cached is not None:
+            return json.loads(cached)
+
+        report = await build()
+        await set_cache(key, json.dumps(report), ttl=ttl)
+        return report
+
+    @asynccontextmanager
+    async def _read_session(self):
+        """
+        session کوتاه‌عمر برای یک کوئری گزارش، در حالت AUTOCOMMIT؛
+        هر کوئری تجمیعی خودش snapshot سازگار دارد و BEGIN/ROLLBACK جدا لازم نیست
+        """
+        async with self.session_factory() as session:
+            await session.connection(execution_options={"isolation_level": "AUTOCOMMIT"})
+            yield session
 
-        total_needs = len(needs)
-        completed_needs = len([n for n in needs if n.status == "completed"])
-        active_needs = len([n for n in needs if n.status in ["pending", "active"]])
+    async def _scalar(self, query) -> Any:
+        """اجرای یک کوئری تک‌مقداری با session جدا (قابل اجرای همزمان)"""
+        async with self._read_session() as session:
+            return await session.scalar(query)
 
-        total_target = sum((n.target_amount or 0) for n in needs)
-        total_collected = sum((n.collected_amount or 0) for n in needs)
+    async def _all(self, query) -> List[Any]:
+        """اجرای یک کوئری و برگرداندن همه سطرها با session جدا (قابل اجرای همزمان)"""
+        async with self._read_session() as session:
+            return (await session.execute(query)).all()
+
+    async def _get_charity_needs_stats(self, charity_id: int, year: int) -> Dict[str, Any]:
+        """آمار نیازهای یک خیریه"""
+
+        start_date, end_date = _year_range(year)
+
+        # شمارش و جمع‌ها در یک کوئری تجمیعی با FILTER، بدون بارگذاری سطرها
+        query = select(
+            func.count(NeedAd.id).label("total"),
+            func.count(NeedAd.id).filter(NeedAd.status == "completed").label("completed"),
+            func.count(NeedAd.id).filter(NeedAd.status.in_(_OPEN_NEED_STATUSES)).label("active"),
+            func.coalesce(func.sum(NeedAd.target_amount), 0).label("target"),
+            func.coalesce(func.sum(NeedAd.collected_amount), 0).label("collected")
+        ).where(
+            NeedAd.charity_id == charity_id,
+            NeedAd.created_at >= start_date,
+            NeedAd.created_at < end_date
+        )
+        row = (await self._all(query))[0]
+
+        total_needs = row.total
+        completed_needs = row.completed
+        active_needs = row.active
+
+        total_target = row.target
+        total_collected = row.collected
 
         return {
             "total_needs": total_needs,
@@ -346,28 +569,21 @@ class FinancialReportService:
     async def _get_charity_donors_stats(self, charity_id: int, year: int) -> Dict[str, Any]:
         """آمار کمک‌کنندگان یک خیریه"""
 
-        start_date = datetime(year, 1, 1)
-        end_date = datetime(year, 12, 31)
-
-        # تعداد کمک‌کنندگان منحصر به فرد
-        unique_donors_query = select(func.count(func.distinct(Donation.donor_id))).where(
-            and_(
-                Donation.charity_id == charity_id,
-                Donation.created_at.between(start_date, end_date),
-                Donation.status == "completed"
-            )
-        )
-        unique_donors = await self.db.scalar(unique_donors_query) or 0
-
-        # میانگین کمک
-        avg_donation_query = select(func.coalesce(func.avg(Donation.amount), 0)).where(
-            and_(
-                Donation.charity_id == charity_id,
-                Donation.created_at.between(start_date, end_date),
-                Donation.status == "completed"
-            )
+        start_date, end_date = _year_range(year)
+
+        # تعداد کمک‌کنندگان منحصر به فرد و میانگین کمک با یک کوئری روی همان سطرها
+        query = select(
+            func.count(func.distinct(Donation.donor_id)).label("unique_donors"),
+            func.coalesce(func.avg(Donation.amount), 0).label("average")
+        ).where(
+            Donation.charity_id == charity_id,
+            Donation.created_at >= start_date,
+            Donation.created_at < end_date,
+            Donation.status == "completed"
         )
-        avg_donation = await self.db.scalar(avg_donation_query) or 0
+        row = (await self._all(query))[0]
+        unique_donors = row.unique_donors or 0
+        avg_donation = row.average or 0
 
         return {
             "unique_donors": unique_donors,
@@ -1,22 +1,63 @@
 # app/services/impact_report_service.py - فایل جدید
 
+import asyncio
+import heapq
+import json
+
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, and_, func, desc
 from datetime import datetime, timedelta
 from typing import Dict, Any, List, Optional
 from collections import defaultdict
+from dataclasses import dataclass, field
 
 from models.order import Order, OrderItem
 from models.need_ad import NeedAd
 from models.product import Product
 from models.charity import Charity
+from core.database import AsyncSessionLocal
+from core.cache import get_cache, set_cache, delete_cache_prefix
+
+
+# وضعیت سفارش‌هایی که در گزارش تأثیر حساب می‌شوند (شرط ایندکس ix_orders_need_report)
+_IMPACT_ORDER_STATUSES = ("delivered", "confirmed", "shipped")
+
+
+@dataclass(slots=True)
+class _ProductAgg:
+    """جمع فروش یک محصول برای یک نیاز"""
+    quantity: int = 0
+    amount: float = 0.0
+    charity_amount: float = 0.0
+
+
+@dataclass(slots=True)
+class _NeedAgg:
+    """اطلاعات یک نیاز، جمع سفارش‌هایش و فروش محصولاتش"""
+    title: str = ""
+    category: Optional[str] = None
+    target_amount: Optional[float] = None
+    collected_amount: Optional[float] = None
+    orders_count: int = 0
+    total_amount: float = 0.0
+    charity_amount: float = 0.0
+    products: Dict[int, _ProductAgg] = field(default_factory=dict)
 
 
 class ImpactReportService:
     """سرویس گزارش تأثیر فروش محصولات بر آگهی‌های نیاز"""
 
-    def __init__(self, db: AsyncSession):
+    # تعداد سطر در هر دسته خواندن از cursor سمت سرور
+    STREAM_BATCH_SIZE = 1000
+
+    # گزارش‌های تأثیر برای داشبوردها مدت کوتاهی کش می‌شوند (ثانیه)
+    REPORT_CACHE_TTL = 120
+    CACHE_PREFIX = "impact:"
+
+    def __init__(self, db: AsyncSession, session_factory=AsyncSessionLocal):
         self.db = db
+        # کوئری‌های مستقل هر کدام با session خودشان همزمان اجرا می‌شوند
+        self.session_factory = session_factory
 
     async def generate_impact_report(
             self,
@@ -31,181 +72,185 @@ class ImpactReportService:
         - چه درصدی از نیازها از طریق فروش محصولات تأمین شده
         - رتبه‌بندی محصولات بر اساس تأثیرگذاری
         """
+        return json.loads(await self.generate_impact_report_json(start_date, end_date, charity_id, need_id))
 
+    async def generate_impact_report_json(
+            self,
+            start_date: Optional[datetime] = None,
+            end_date: Optional[datetime] = None,
+            charity_id: Optional[int] = None,
+            need_id: Optional[int] = None
+    ) -> str:
+        """گزارش تأثیر به صورت JSON آماده ارسال (همان رشته کش‌شده، بدون decode و encode دوباره)"""
+        return await self._cached_json(
+            f"{self.CACHE_PREFIX}report:{start_date}:{end_date}:{charity_id}:{need_id}",
+            lambda: self._build_impact_report(start_date, end_date, charity_id, need_id)
+        )
+
+    async def _build_impact_report(
+            self,
+            start_date: Optional[datetime],
+            end_date: Optional[datetime],
+            charity_id: Optional[int],
+            need_id: Optional[int]
+    ) -> Dict[str, Any]:
+        """محاسبه گزارش تأثیر (بدون کش)"""
+
+        now = datetime.utcnow()
         if not end_date:
-            end_date = datetime.utcnow()
+            end_date = now
         if not start_date:
             start_date = end_date - timedelta(days=30)
 
-        # ========== 1. دریافت سفارش‌هایی که به نیازها مرتبط هستند ==========
-        orders_query = select(Order).where(
-            and_(
-                Order.created_at.between(start_date, end_date),
-                Order.need_id.isnot(None),  # فقط سفارش‌های مرتبط با نیاز
-                Order.status.in_(["delivered", "confirmed", "shipped"])
+        # ========== 1. شرط سفارش‌هایی که به نیازها مرتبط هستند ==========
+        # ترتیب شرط‌ها مطابق ایندکس جزئی ix_orders_need_report (charity_id, created_at)
+        order_conditions = [Order.charity_id == charity_id] if charity_id else []
+        order_conditions += [
+            Order.created_at.between(start_date, end_date),
+            Order.need_id.isnot(None),  # فقط سفارش‌های مرتبط با نیاز
+            Order.status.in_(_IMPACT_ORDER_STATUSES)
+        ]
+        if need_id:
+            order_conditions.append(Order.need_id == need_id)
+
+        # ========== 2. تجمیع بر اساس نیاز و محصول در دیتابیس ==========
+        # جمع سفارش‌های هر نیاز همراه اطلاعات خود نیاز با JOIN؛ فقط نیازهای موجود برمی‌گردند
+        need_totals_query = (
+            select(
+                Order.need_id,
+                NeedAd.title,
+                NeedAd.category,
+                NeedAd.target_amount,
+                NeedAd.collected_amount,
+                func.count(Order.id).label("orders_count"),
+                func.coalesce(func.sum(Order.grand_total), 0).label("total_amount"),
+                func.coalesce(func.sum(Order.charity_amount), 0).label("charity_amount")
             )
+            .join(NeedAd, NeedAd.id == Order.need_id)
+            .where(and_(*order_conditions))
+            .group_by(Order.need_id, NeedAd.id)
         )
 
-        if charity_id:
-            orders_query = orders_query.where(Order.charity_id == charity_id)
-        if need_id:
-            orders_query = orders_query.where(Order.need_id == need_id)
-
-        orders_result = await self.db.execute(orders_query)
-        orders = orders_result.scalars().all()
-
-        # ========== 2. گروه‌بندی بر اساس نیاز ==========
-        need_orders = defaultdict(lambda: {
-            "orders": [],
-            "total_amount": 0,
-            "charity_amount": 0,
-            "products": defaultdict(lambda: {
-                "quantity": 0,
-                "amount": 0,
-                "charity_amount": 0
-            })
-        })
-
-        for order in orders:
-            need_orders[order.need_id]["orders"].append(order)
-            need_orders[order.need_id]["total_amount"] += order.grand_total or 0
-            need_orders[order.need_id]["charity_amount"] += order.charity_amount or 0
-
-            # دریافت آیتم‌های سفارش
-            items_query = select(OrderItem).where(OrderItem.order_id == order.id)
-            items_result = await self.db.execute(items_query)
-            items = items_result.scalars().all()
-
-            for item in items:
-                product_id = item.product_id
-                need_orders[order.need_id]["products"][product_id]["quantity"] += item.quantity
-                need_orders[order.need_id]["products"][product_id]["amount"] += item.subtotal or 0
-                need_orders[order.need_id]["products"][product_id]["charity_amount"] += item.charity_total or 0
-
-        # ========== 3. دریافت اطلاعات کامل نیازها ==========
-        need_ids = list(need_orders.keys())
-        needs_data = {}
-
-        if need_ids:
-            needs_query = select(NeedAd).where(NeedAd.id.in_(need_ids))
-            needs_result = await self.db.execute(needs_query)
-            needs = needs_result.scalars().all()
-
-            for need in needs:
-                needs_data[need.id] = need
-
-        # ========== 4. دریافت اطلاعات محصولات ==========
-        all_product_ids = set()
-        for need_data in need_orders.values():
-            all_product_ids.update(need_data["products"].keys())
-
-        products_data = {}
-        if all_product_ids:
-            products_query = select(Product).where(Product.id.in_(all_product_ids))
-            products_result = await self.db.execute(products_query)
-            products = products_result.scalars().all()
+        # جمع فروش هر محصول در هر نیاز
+        need_products_query = (
+            select(
+                Order.need_id,
+                OrderItem.product_id,
+                func.coalesce(func.sum(OrderItem.quantity), 0).label("quantity"),
+                func.coalesce(func.sum(OrderItem.subtotal), 0).label("amount"),
+                func.coalesce(func.sum(OrderItem.charity_total), 0).label("charity_amount")
+            )
+            .join(OrderItem, OrderItem.order_id == Order.id)
+            .where(and_(*order_conditions))
+            .group_by(Order.need_id, OrderItem.product_id)
+        )
+
+        need_totals_rows, need_products = await asyncio.gather(
+            self._all(need_totals_query),
+            self._stream_need_products(need_products_query)
+        )
+
+        need_orders = {}
+        for row in need_totals_rows:
+            need_orders[row.need_id] = _NeedAgg(
+                title=row.title,
+                category=row.category,
+                target_amount=row.target_amount,
+                collected_amount=row.collected_amount,
+                orders_count=row.orders_count,
+                total_amount=row.total_amount,
+                charity_amount=row.charity_amount,
+                products=need_products.get(row.need_id, {})
+            )
 
-            for product in products:
-                products_data[product.id] = product
+        all_product_ids = {product_id for products in need_products.values() for product_id in products}
 
-        # ========== 5. ساخت خروجی ==========
+        # ========== 3. دریافت اطلاعات محصولات ==========
+        products = []
+        if all_product_ids:
+            products = await self._scalars(select(Product).where(Product.id.in_(all_product_ids)))
+        products_data = {product.id: product for product in products}
+
+        # ========== 4. ساخت خروجی ==========
         impact_by_need = []
         total_need_amount = 0
         total_covered_by_products = 0
+        fully_funded_needs = 0
 
         for need_id, need_info in need_orders.items():
-            need = needs_data.get(need_id)
-            if not need:
-                continue
-
             # محاسبه درصد تأمین شده از طریق فروش محصولات
-            covered_amount = need_info["total_amount"]
-            target_amount = need.target_amount or 1
+            covered_amount = need_info.total_amount
+            target_amount = need_info.target_amount or 1
             coverage_percentage = (covered_amount / target_amount * 100) if target_amount > 0 else 0
+            is_fully_funded = coverage_percentage >= 100
 
             total_need_amount += target_amount
             total_covered_by_products += covered_amount
+            fully_funded_needs += is_fully_funded
+
+            # ضریب درصد سهم هر محصول از سهم خیریه این نیاز؛ یک بار برای هر نیاز
+            impact_factor = 100 / need_info.charity_amount if need_info.charity_amount > 0 else 0
 
             # محصولات مؤثر در این نیاز
             top_products = []
-            for product_id, product_stats in need_info["products"].items():
+            for product_id, product_stats in need_info.products.items():
                 product = products_data.get(product_id)
                 if product:
                     top_products.append({
                         "product_id": product_id,
                         "product_name": product.name,
                         "vendor_id": product.vendor_id,
-                        "quantity_sold": product_stats["quantity"],
-                        "revenue": round(product_stats["amount"], 0),
-                        "charity_contribution": round(product_stats["charity_amount"], 0),
-                        "impact_percentage": round(
-                            (product_stats["charity_amount"] / need_info["charity_amount"] * 100)
-                            if need_info["charity_amount"] > 0 else 0, 1
-                        )
+                        "quantity_sold": product_stats.quantity,
+                        "revenue": round(product_stats.amount, 0),
+                        "charity_contribution": round(product_stats.charity_amount, 0),
+                        "impact_percentage": round(product_stats.charity_amount * impact_factor, 1)
                     })
 
-            # مرتب‌سازی بر اساس بیشترین تأثیر
-            top_products.sort(key=lambda x: x["charity_contribution"], reverse=True)
-
             impact_by_need.append({
                 "need_id": need_id,
-                "need_title": need.title,
-                "need_category": need.category,
+                "need_title": need_info.title,
+                "need_category": need_info.category,
                 "target_amount": round(target_amount, 0),
-                "collected_amount": round(need.collected_amount or 0, 0),
+                "collected_amount": round(need_info.collected_amount or 0, 0),
                 "covered_by_products": round(covered_amount, 0),
                 "coverage_percentage": round(coverage_percentage, 1),
-                "orders_count": len(need_info["orders"]),
-                "top_products": top_products[:5],  # 5 محصول برتر
-                "is_fully_funded": coverage_percentage >= 100
+                "orders_count": need_info.orders_count,
+                # 5 محصول برتر بر اساس بیشترین تأثیر
+                "top_products": heapq.nlargest(5, top_products, key=lambda x: x["charity_contribution"]),
+                "is_fully_funded": is_fully_funded
             })
 
-        # ========== 6. رتبه‌بندی محصولات بر اساس تأثیرگذاری ==========
-        product_impact = defaultdict(lambda: {
-            "product_id": 0,
-            "product_name": "",
-            "vendor_id": 0,
-            "vendor_name": "",
-            "needs_helped": set(),
-            "total_quantity": 0,
-            "total_revenue": 0,
-            "total_charity": 0,
-            "needs_count": 0
-        })
+        # ========== 5. رتبه‌بندی محصولات بر اساس تأثیرگذاری ==========
+        # سطرهای نیاز/محصول از GROUP BY یکتا هستند، پس هر سطر یعنی یک نیاز کمک‌شده دیگر؛
+        # جمع‌ها در یک لیست ثابت [تعداد نیاز، تعداد فروش، درآمد، سهم خیریه] برای هر محصول
+        product_totals = {}
+        for need_info in need_orders.values():
+            for product_id, product_stats in need_info.products.items():
+                if product_id not in products_data:
+                    continue
+                totals = product_totals.get(product_id)
+                if totals is None:
+                    totals = product_totals[product_id] = [0, 0, 0, 0]
+                totals[0] += 1
+                totals[1] += product_stats.quantity
+                totals[2] += product_stats.amount
+                totals[3] += product_stats.charity_amount
 
-        for need_id, need_info in need_orders.items():
-            for product_id, product_stats in need_info["products"].items():
-                product = products_data.get(product_id)
-                if product:
-                    key = product_id
-                    product_impact[key]["product_id"] = product_id
-                    product_impact[key]["product_name"] = product.name
-                    product_impact[key]["vendor_id"] = product.vendor_id
-                    product_impact[key]["needs_helped"].add(need_id)
-                    product_impact[key]["total_quantity"] += product_stats["quantity"]
-                    product_impact[key]["total_revenue"] += product_stats["amount"]
-                    product_impact[key]["total_charity"] += product_stats["charity_amount"]
-
-        # تبدیل set به count و لیست
         top_products_list = []
-        for product_id, stats in product_impact.items():
+        for product_id, (needs_helped, quantity, revenue, charity) in product_totals.items():
+            product = products_data[product_id]
             top_products_list.append({
-                "product_id": stats["product_id"],
-                "product_name": stats["product_name"],
-                "vendor_id": stats["vendor_id"],
-                "needs_helped_count": len(stats["needs_helped"]),
-                "total_quantity_sold": stats["total_quantity"],
-                "total_revenue": round(stats["total_revenue"], 0),
-                "total_charity_contribution": round(stats["total_charity"], 0),
-                "impact_score": round(
-                    stats["total_charity"] * 0.7 + len(stats["needs_helped"]) * 30, 1
-                )
+                "product_id": product_id,
+                "product_name": product.name,
+                "vendor_id": product.vendor_id,
+                "needs_helped_count": needs_helped,
+                "total_quantity_sold": quantity,
+                "total_revenue": round(revenue, 0),
+                "total_charity_contribution": round(charity, 0),
+                "impact_score": round(charity * 0.7 + needs_helped * 30, 1)
             })
 
-        # مرتب‌سازی بر اساس امتیاز تأثیر
-        top_products_list.sort(key=lambda x: x["impact_score"], reverse=True)
-
-        # ========== 7. آمار کلی ==========
+        # ========== 6. آمار کلی ==========
         summary = {
             "total_needs_analyzed": len(impact_by_need),
             "total_needs_amount": round(total_need_amount, 0),
@@ -213,7 +258,7 @@ class ImpactReportService:
             "overall_coverage_percentage": round(
                 (total_covered_by_products / total_need_amount * 100) if total_need_amount > 0 else 0, 1
             ),
-            "fully_funded_needs": len([n for n in impact_by_need if n["is_fully_funded"]]),
+            "fully_funded_needs": fully_funded_needs,
             "date_range": {
                 "start": start_date.isoformat(),
                 "end": end_date.isoformat()
@@ -223,8 +268,9 @@ class ImpactReportService:
         return {
             "summary": summary,
             "impact_by_need": impact_by_need,
-            "top_impact_products": top_products_list[:10],  # 10 محصول برتر
-            "generated_at": datetime.utcnow().isoformat()
+            # 10 محصول برتر بر اساس امتیاز تأثیر
+            "top_impact_products": heapq.nlargest(10, top_products_list, key=lambda x: x["impact_score"]),
+            "generated_at": now.isoformat()
         }
 
     async def generate_charity_impact_report(
@@ -235,49 +281,116 @@ class ImpactReportService:
         """
         گزارش تأثیر خیریه - چند درصد از نیازها از طریق فروش محصولات تأمین شده
         """
+        return json.loads(await self.generate_charity_impact_report_json(charity_id, year))
+
+    async def generate_charity_impact_report_json(self, charity_id: int, year: Optional[int] = None) -> str:
+        """گزارش تأثیر خیریه به صورت JSON آماده ارسال"""
         if not year:
             year = datetime.utcnow().year
 
+        return await self._cached_json(
+            f"{self.CACHE_PREFIX}charity:{charity_id}:{year}",
+            lambda: self._build_charity_impact_report(charity_id, year)
+        )
+
+    async def _build_charity_impact_report(self, charity_id: int, year: int) -> Dict[str, Any]:
+        """محاسبه گزارش تأثیر خیریه (بدون کش)"""
+
         start_date = datetime(year, 1, 1)
         end_date = datetime(year, 12, 31)
 
-        # کل نیازهای خیریه
-        needs_query = select(NeedAd).where(
-            and_(
-                NeedAd.charity_id == charity_id,
-                NeedAd.created_at.between(start_date, end_date)
-            )
+        need_conditions = and_(
+            NeedAd.charity_id == charity_id,
+            NeedAd.created_at.between(start_date, end_date)
+        )
+        order_conditions = and_(
+            Order.charity_id == charity_id,
+            Order.need_id.isnot(None),
+            Order.created_at.between(start_date, end_date),
+            Order.status.in_(["delivered", "confirmed"])
         )
-        needs_result = await self.db.execute(needs_query)
-        needs = needs_result.scalars().all()
+
+        # کل نیازهای خیریه
+        needs_query = select(
+            func.count(NeedAd.id).label("count"),
+            func.coalesce(func.sum(NeedAd.target_amount), 0).label("target")
+        ).where(need_conditions)
 
         # سفارش‌های مرتبط با نیازهای این خیریه
-        orders_query = select(Order).where(
-            and_(
-                Order.charity_id == charity_id,
-                Order.need_id.isnot(None),
-                Order.created_at.between(start_date, end_date),
-                Order.status.in_(["delivered", "confirmed"])
+        orders_query = select(func.coalesce(func.sum(Order.charity_amount), 0)).where(order_conditions)
+
+        # نیازهای کامل‌تأمین‌شده‌ای که سفارش مرتبط دارند
+        funded_query = (
+            select(func.count(func.distinct(Order.need_id)))
+            .join(NeedAd, NeedAd.id == Order.need_id)
+            .where(
+                order_conditions,
+                need_conditions,
+                func.coalesce(NeedAd.collected_amount, 0) >= func.coalesce(NeedAd.target_amount, 0)
             )
         )
-        orders_result = await self.db.execute(orders_query)
-        orders = orders_result.scalars().all()
 
-        total_needs_amount = sum((n.target_amount or 0) for n in needs)
-        total_orders_amount = sum((o.charity_amount or 0) for o in orders)
+        needs_rows, total_orders_amount, fully_funded = await asyncio.gather(
+            self._all(needs_query),
+            self._scalar(orders_query),
+            self._scalar(funded_query)
+        )
+        total_needs, total_needs_amount = needs_rows[0]
 
         return {
             "charity_id": charity_id,
             "year": year,
-            "total_needs": len(needs),
+            "total_needs": total_needs,
             "total_needs_amount": round(total_needs_amount, 0),
             "total_funded_by_products": round(total_orders_amount, 0),
             "products_funding_percentage": round(
                 (total_orders_amount / total_needs_amount * 100) if total_needs_amount > 0 else 0, 1
             ),
-            "needs_fully_funded_by_products": len([
-                o for o in orders
-                if o.need_id and any(
-                    n.id == o.need_id and (n.collected_amount or 0) >= (n.target_amount or 0) for n in needs)
-            ])
-        }
\ No newline at end of file
+            "needs_fully_funded_by_products": fully_funded or 0
+        }
+
+    @classmethod
+    async def invalidate_cache(cls):
+        """پاک کردن همه گزارش‌های تأثیر کش‌شده (بعد از تغییر وضعیت سفارش‌های مرتبط با نیاز)"""
+        await delete_cache_prefix(cls.CACHE_PREFIX)
+
+    async def _cached_json(self, key: str, build) -> str:
+        """JSON گزارش از کش، یا ساختن، serialize و ذخیره آن برای REPORT_CACHE_TTL ثانیه"""
+        cached = await get_cache(key)
+        if cached is not None:
+            return cached
+
+        report = json.dumps(await build(), ensure_ascii=False)
+        await set_cache(key, report, ttl=self.REPORT_CACHE_TTL)
+        return report
+
+    async def _stream_need_products(self, query) -> Dict[int, Dict[int, _ProductAgg]]:
+        """
+        خواندن جمع فروش محصول/نیاز با cursor سمت سرور؛ سطرها دسته‌ای می‌رسند
+        و مستقیم در دیکشنری نیاز -> محصول قرار می‌گیرند، بدون ساختن لیست کامل نتیجه
+        """
+        need_products = defaultdict(dict)
+        async with self.session_factory() as session:
+            result = await session.stream(query.execution_options(yield_per=self.STREAM_BATCH_SIZE))
+            async for row in result:
+                need_products[row.need_id][row.product_id] = _ProductAgg(
+                    quantity=row.quantity,
+                    amount=row.amount,
+                    charity_amount=row.charity_amount
+                )
+        return need_products
+
+    async def _all(self, query) -> List[Any]:
+        """اجرای یک کوئری با session جدا و برگرداندن همه سطرها"""
+        async with self.session_factory() as session:
+            return (await session.execute(query)).all()
+
+    async def _scalar(self, query) -> Any:
+        """اجرای یک کوئری تک‌مقداری با session جدا"""
+        async with self.session_factory() as session:
+            return await session.scalar(query)
+
+    async def _scalars(self, query) -> List[Any]:
+        """اجرای یک کوئری ORM با session جدا و برگرداندن اشیا"""
+        async with self.session_factory() as session:
+            return (await session.scalars(query)).all()
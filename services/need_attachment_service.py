@@ -1,9 +1,8 @@
 # app/services/need_attachment_service.py
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_
+from sqlalchemy import select, and_, update, func
 from fastapi import HTTPException, UploadFile
 from typing import List, Optional
-from datetime import datetime
 
 from models.need_attachment import NeedAttachment, AttachmentPurpose
 from models.need_ad import NeedAd
@@ -13,6 +12,9 @@ from models.user import User
 from services.file_service import FileService
 from schemas.file import FileUpload
 
+# نقش‌هایی که به همه پیوست‌ها دسترسی دارند
+_MANAGER_ROLES = frozenset({"ADMIN", "CHARITY_MANAGER"})
+
 
 class NeedAttachmentService:
     def __init__(self, db: AsyncSession):
@@ -46,8 +48,10 @@ class NeedAttachmentService:
             tags=[purpose.value, "need_attachment"]
         )
 
+        # خواندن، hash و رمزنگاری فایل در thread pool انجام می‌شود؛ رکورد فایل فقط flush می‌شود
+        # تا همراه رکورد پیوست در یک تراکنش commit شود
         file_attachment = await self.file_service.upload_file(
-            file, upload_data, user, encrypt_sensitive=encrypt
+            file, upload_data, user, encrypt_sensitive=encrypt, commit=False
         )
 
         # ایجاد رکورد ارتباط
@@ -62,7 +66,13 @@ class NeedAttachmentService:
         )
 
         self.db.add(need_attachment)
-        await self.db.commit()
+        try:
+            await self.db.commit()
+        except Exception:
+            # فایلی که قبل از commit روی دیسک نوشته شد بدون رکورد باقی نمی‌ماند
+            await self.db.rollback()
+            await self.file_service.discard_stored_files([file_attachment.storage_path])
+            raise
         await self.db.refresh(need_attachment)
 
         return need_attachment
@@ -83,13 +93,17 @@ class NeedAttachmentService:
         result = await self.db.execute(query)
         attachments = result.scalars().all()
 
-        # فیلتر دسترسی
-        filtered = []
-        for attachment in attachments:
-            if await self._can_access_attachment(attachment, user):
-                filtered.append(attachment)
+        # نیاز یک بار خوانده می‌شود (همه پیوست‌ها متعلق به همین نیازند)،
+        # و فقط وقتی پیوست خصوصی برای بررسی مالکیت وجود دارد
+        need = None
+        if user and any(not attachment.is_public for attachment in attachments):
+            need = await self.db.get(NeedAd, need_id)
 
-        return filtered
+        # فیلتر دسترسی
+        return [
+            attachment for attachment in attachments
+            if self._can_access_attachment(attachment, user, need)
+        ]
 
     async def log_access(
         self,
@@ -98,18 +112,25 @@ class NeedAttachmentService:
         action: str = "view"
     ):
         """لاگ دسترسی به فایل حساس"""
-        attachment = await self.db.get(NeedAttachment, attachment_id)
-        if not attachment or not attachment.access_log_enabled:
+        # به‌روزرسانی آمار با یک UPDATE اتمیک (بدون SELECT قبلی)؛ file_id برای لاگ برگردانده می‌شود
+        file_id = await self.db.scalar(
+            update(NeedAttachment)
+            .where(
+                NeedAttachment.id == attachment_id,
+                NeedAttachment.access_log_enabled == True
+            )
+            .values(
+                access_count=NeedAttachment.access_count + 1,
+                last_accessed_at=func.now()
+            )
+            .returning(NeedAttachment.file_id)
+        )
+        if file_id is None:
             return
 
-        # به‌روزرسانی آمار
-        attachment.access_count += 1
-        attachment.last_accessed_at = datetime.utcnow()
-        self.db.add(attachment)
-
         # ایجاد لاگ
         log = FileAccessLog(
-            file_id=attachment.file_id,
+            file_id=file_id,
             user_id=user.id if user else None,
             action=action,
             ip_address="0.0.0.0",  # از request
@@ -120,26 +141,24 @@ class NeedAttachmentService:
         self.db.add(log)
         await self.db.commit()
 
-    async def _can_access_attachment(
+    def _can_access_attachment(
         self,
         attachment: NeedAttachment,
-        user: Optional[User]
+        user: Optional[User],
+        need: Optional[NeedAd]
     ) -> bool:
-        """بررسی دسترسی به فایل"""
+        """بررسی دسترسی به فایل؛ need همان نیاز پیوست است که از قبل خوانده شده"""
         if attachment.is_public:
             return True
 
         if not user:
             return False
 
-        user_roles = [r.key for r in user.roles]
-
         # ادمین/مدیر
-        if "ADMIN" in user_roles or "CHARITY_MANAGER" in user_roles:
+        if not user.role_keys.isdisjoint(_MANAGER_ROLES):
             return True
 
         # مالک نیاز
-        need = await self.db.get(NeedAd, attachment.need_id)
         if need and need.needy_user_id == user.id:
             return True
 
@@ -1,7 +1,7 @@
 # app/services/need_emergency_service.py
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, and_, or_
-from fastapi import HTTPException, status
+from fastapi import BackgroundTasks, HTTPException, status
 from datetime import datetime, timedelta
 from typing import List, Optional, Dict, Any
 
@@ -9,6 +9,10 @@ from models.need_emergency import NeedEmergency, EmergencyType, EmergencySeverit
 from models.need_ad import NeedAd
 from models.user import User
 from services.notification_service import NotificationService
+from core.database import AsyncSessionLocal
+
+# نقش‌هایی که می‌توانند وضعیت بحرانی اعلام کنند
+_EMERGENCY_DECLARER_ROLES = frozenset({"ADMIN", "CHARITY_MANAGER"})
 
 
 class NeedEmergencyService:
@@ -20,13 +24,16 @@ class NeedEmergencyService:
             self,
             need: NeedAd,
             emergency_data: Dict[str, Any],
-            user: User
+            user: User,
+            background_tasks: Optional[BackgroundTasks] = None
     ) -> NeedEmergency:
-        """تبدیل نیاز معمولی به نیاز اضطراری"""
+        """
+        تبدیل نیاز معمولی به نیاز اضطراری
+        با background_tasks نوتیفیکیشن همگانی بعد از ارسال پاسخ فرستاده می‌شود
+        """
 
         # بررسی مجوز
-        user_roles = [r.key for r in user.roles]
-        if "ADMIN" not in user_roles and "CHARITY_MANAGER" not in user_roles:
+        if user.role_keys.isdisjoint(_EMERGENCY_DECLARER_ROLES):
             raise HTTPException(status_code=403, detail="Only admins can declare emergencies")
 
         # ایجاد رکورد بحران
@@ -62,7 +69,10 @@ class NeedEmergencyService:
 
         # ارسال نوتیفیکیشن فوری
         if emergency_data.get("notify_all_users", True):
-            await self._send_emergency_notifications(emergency, need)
+            if background_tasks is not None:
+                background_tasks.add_task(broadcast_emergency_notifications, emergency.id, need.id)
+            else:
+                await self._send_emergency_notifications(emergency, need)
 
         return emergency
 
@@ -86,4 +96,16 @@ class NeedEmergencyService:
             send_sms=emergency.notify_sms,
             send_email=emergency.notify_email,
             send_push=emergency.notify_push,
-        )
\ No newline at end of file
+        )
+
+
+async def broadcast_emergency_notifications(emergency_id: int, need_id: int):
+    """
+    ارسال نوتیفیکیشن همگانی بحران در پس‌زمینه؛ session درخواست تا این لحظه بسته شده،
+    پس بحران و نیاز با session مستقل دوباره خوانده می‌شوند
+    """
+    async with AsyncSessionLocal() as db:
+        emergency = await db.get(NeedEmergency, emergency_id)
+        need = await db.get(NeedAd, need_id)
+        if emergency and need:
+            await NeedEmergencyService(db)._send_emergency_notifications(emergency, need)
@@ -1,6 +1,8 @@
 # app/services/need_log_service.py
+import asyncio
+
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_, desc
+from sqlalchemy import select, and_, desc, func, update, tuple_
 from datetime import datetime
 from typing import Optional, List, Dict, Any
 from fastapi import Request
@@ -8,11 +10,14 @@ from fastapi import Request
 from models.file_access_log import FileAccessLog
 from models.need_attachment import NeedAttachment
 from models.user import User
+from core.database import AsyncSessionLocal
 
 
 class NeedLogService:
-    def __init__(self, db: AsyncSession):
+    def __init__(self, db: AsyncSession, session_factory=AsyncSessionLocal):
         self.db = db
+        # صفحه لاگ‌ها و شمارش کل با session‌های جدا همزمان اجرا می‌شوند
+        self.session_factory = session_factory
 
     async def log_attachment_access(
             self,
@@ -23,12 +28,21 @@ class NeedLogService:
     ) -> FileAccessLog:
         """ثبت دسترسی به فایل پیوست نیاز"""
 
-        attachment = await self.db.get(NeedAttachment, attachment_id)
-        if not attachment:
+        # به‌روزرسانی آمار با یک UPDATE اتمیک؛ افزایش‌های همزمان از دست نمی‌روند
+        file_id = await self.db.scalar(
+            update(NeedAttachment)
+            .where(NeedAttachment.id == attachment_id)
+            .values(
+                access_count=NeedAttachment.access_count + 1,
+                last_accessed_at=func.now()
+            )
+            .returning(NeedAttachment.file_id)
+        )
+        if file_id is None:
             raise ValueError("Attachment not found")
 
         log = FileAccessLog(
-            file_id=attachment.file_id,
+            file_id=file_id,
             user_id=user.id if user else None,
             action=action,
             ip_address=request.client.host if request.client else "0.0.0.0",
@@ -38,12 +52,6 @@ class NeedLogService:
         )
 
         self.db.add(log)
-
-        # به‌روزرسانی آمار
-        attachment.access_count += 1
-        attachment.last_accessed_at = datetime.utcnow()
-        self.db.add(attachment)
-
         await self.db.commit()
         await self.db.refresh(log)
 
@@ -52,21 +60,46 @@ class NeedLogService:
     async def get_attachment_logs(
             self,
             attachment_id: int,
-            page: int = 1,
-            limit: int = 20
+            limit: int = 20,
+            after_ts: Optional[datetime] = None,
+            after_id: Optional[int] = None
     ) -> Dict[str, Any]:
-        """دریافت لاگ دسترسی به یک فایل"""
+        """
+        دریافت لاگ دسترسی به یک فایل با صفحه‌بندی keyset (جدیدترین اول)؛
+        برای صفحه بعد after_ts/after_id از next_cursor صفحه قبل فرستاده می‌شود
+        """
 
-        query = select(FileAccessLog).where(
-            FileAccessLog.file_id == FileAccessLog.file_id  # TODO: fix this
-        ).order_by(FileAccessLog.accessed_at.desc())
+        attachment = await self.db.get(NeedAttachment, attachment_id)
+        if not attachment:
+            raise ValueError("Attachment not found")
+
+        base = select(FileAccessLog).where(FileAccessLog.file_id == attachment.file_id)
+        # ادامه از آخرین سطر صفحه قبل روی ایندکس (file_id, accessed_at, id)، بدون OFFSET
+        items_query = base
+        if after_ts is not None and after_id is not None:
+            items_query = items_query.where(
+                tuple_(FileAccessLog.accessed_at, FileAccessLog.id) < (after_ts, after_id)
+            )
+        items_query = items_query.order_by(
+            FileAccessLog.accessed_at.desc(),
+            FileAccessLog.id.desc()
+        ).limit(limit)
+        count_query = select(func.count()).select_from(base.subquery())
+
+        items, total = await asyncio.gather(
+            self._scalars(items_query),
+            self._scalar(count_query)
+        )
+
+        next_cursor = None
+        if len(items) == limit:
+            next_cursor = {"after_ts": items[-1].accessed_at, "after_id": items[-1].id}
 
-        # TODO: complete this method
         return {
-            "items": [],
-            "total": 0,
-            "page": page,
-            "limit": limit
+            "items": items,
+            "total": total or 0,
+            "limit": limit,
+            "next_cursor": next_cursor
         }
 
     async def get_need_access_logs(
@@ -84,4 +117,14 @@ class NeedLogService:
             "total": 0,
             "page": page,
             "limit": limit
-        }
\ No newline at end of file
+        }
+
+    async def _scalars(self, query) -> List[Any]:
+        """اجرای یک کوئری ORM با session جدا"""
+        async with self.session_factory() as session:
+            return (await session.scalars(query)).all()
+
+    async def _scalar(self, query) -> Any:
+        """اجرای یک کوئری تک‌مقداری با session جدا"""
+        async with self.session_factory() as session:
+            return await session.scalar(query)
@@ -1,28 +1,93 @@
 # app/services/need_service.py
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_, or_
+from sqlalchemy import select, insert, exists, func, and_, or_, literal_column, lambda_stmt
+from sqlalchemy.orm.attributes import flag_modified
 from fastapi import HTTPException, status, UploadFile
 from datetime import datetime, timedelta
 from typing import List, Optional, Dict, Any, Literal
 import math
+import operator
 
 from models.need_ad import NeedAd
 from models.charity import Charity
 from models.need_social_share import NeedSocialShare
 from models.user import User
 from models.need_verification import NeedVerification, VerificationStatus
+from core.database import IS_POSTGRESQL
 from core.permissions import get_current_user
 from schemas.file import FileUpload
+from schemas.need import NeedAdFilter
+from services.financial_report import FinancialReportService
 from services.need_emergency_service import NeedEmergencyService
 
 # تعریف Enums برای استفاده در service
 NeedStatus = Literal["draft", "pending", "approved", "rejected", "active", "completed", "cancelled"]
 PrivacyLevel = Literal["public", "protected", "private"]
 
+# نقش‌هایی که روی همه نیازها اختیار مدیریتی دارند
+_MANAGER_ROLES = frozenset({"ADMIN", "CHARITY_MANAGER"})
+# نقش‌هایی که اجازه دیدن فایل‌های ضمیمه را دارند
+_ATTACHMENT_VIEWER_ROLES = frozenset({"ADMIN", "CHARITY_MANAGER", "CHARITY", "DONOR"})
+
+# ستون‌هایی که کارت لیست نیازها نمایش می‌دهد؛ description و attachments خوانده نمی‌شوند
+_LIST_COLUMNS = (
+    NeedAd.id, NeedAd.uuid, NeedAd.title, NeedAd.short_description, NeedAd.category,
+    NeedAd.target_amount, NeedAd.collected_amount, NeedAd.currency, NeedAd.status,
+    NeedAd.is_urgent, NeedAd.is_emergency, NeedAd.city, NeedAd.province,
+    NeedAd.charity_id, Charity.name.label("charity_name"), NeedAd.created_at,
+)
+
+
+# ستون‌های مجاز مرتب‌سازی با ترتیب‌های از پیش ساخته؛ هر کدام ایندکس (status, ستون) دارند
+_SORT_ORDERS = {
+    name: {"asc": column.asc(), "desc": column.desc()}
+    for name, column in (
+        ("created_at", NeedAd.created_at),
+        ("target_amount", NeedAd.target_amount),
+        ("collected_amount", NeedAd.collected_amount),
+        ("deadline", NeedAd.deadline),
+    )
+}
+
+
+def _ilike_contains(column, value):
+    """جستجوی زیررشته بدون حساسیت به حروف"""
+    return column.ilike(f"%{value}%")
+
+
+# ستون tsvector با ایندکس GIN فقط در PostgreSQL و فقط در migration ساخته شده و در مدل نیست
+_SEARCH_TSV = literal_column("need_ads.search_tsv")
+
+
+def _search_condition(search_text: str):
+    """جستجوی متن نیاز؛ تمام‌متن روی PostgreSQL، در غیر این صورت ILIKE روی عنوان و توضیحات"""
+    if IS_POSTGRESQL:
+        return _SEARCH_TSV.op("@@")(func.plainto_tsquery("simple", search_text))
+    return or_(
+        _ilike_contains(NeedAd.title, search_text),
+        _ilike_contains(NeedAd.short_description, search_text),
+        _ilike_contains(NeedAd.description, search_text)
+    )
+
+
+# (فیلد NeedAdFilter، عملگر، ستون)؛ فیلدهای None یا رشته خالی نادیده گرفته می‌شوند
+_LIST_FILTERS = (
+    ("category", operator.eq, NeedAd.category),
+    ("city", _ilike_contains, NeedAd.city),
+    ("province", _ilike_contains, NeedAd.province),
+    ("charity_id", operator.eq, NeedAd.charity_id),
+    ("is_urgent", operator.eq, NeedAd.is_urgent),
+    ("is_emergency", operator.eq, NeedAd.is_emergency),
+    ("min_amount", operator.ge, NeedAd.target_amount),
+    ("max_amount", operator.le, NeedAd.target_amount),
+)
+
 
 class NeedService:
     def __init__(self, db: AsyncSession):
         self.db = db
+        # نتیجه بررسی مجوز مشاهده؛ سرویس برای هر درخواست ساخته می‌شود و بین کاربران مشترک نیست
+        self._perm_cache: Dict[tuple, bool] = {}
 
     async def create_need(self, need_data, user: User, charity_id: int) -> NeedAd:
         """ایجاد نیاز جدید"""
@@ -34,10 +99,8 @@ class NeedService:
             raise HTTPException(status_code=404, detail="Charity not found")
 
         # بررسی مجوز کاربر برای این خیریه
-        user_roles = [r.key for r in user.roles]
-        if "ADMIN" not in user_roles and \
-                "CHARITY_MANAGER" not in user_roles and \
-                charity.manager_id != user.id:
+        user_roles = user.role_keys
+        if user_roles.isdisjoint(_MANAGER_ROLES) and charity.manager_id != user.id:
             raise HTTPException(status_code=403, detail="Not authorized for this charity")
 
         # ایجاد نیاز
@@ -71,6 +134,9 @@ class NeedService:
             need.status = "pending"
 
         self.db.add(need)
+        # امتیاز اعتماد به شناسه نیاز وابسته است، پس بعد از flush محاسبه می‌شود
+        await self.db.flush()
+        await self.refresh_trust_score(need)
         await self.db.commit()
         await self.db.refresh(need)
         return need
@@ -84,6 +150,17 @@ class NeedService:
             description: Optional[str] = None
     ):
         """اضافه کردن فایل به نیاز"""
+        attachments = await self.add_attachments_to_need(need_id, [file], user, description)
+        return attachments[0]
+
+    async def add_attachments_to_need(
+            self,
+            need_id: int,
+            files: List[UploadFile],
+            user: User,
+            description: Optional[str] = None
+    ):
+        """اضافه کردن چند فایل به نیاز در یک تراکنش"""
         need = await self._get_need_with_permission(need_id, user)
 
         # ایجاد سرویس فایل
@@ -91,7 +168,7 @@ class NeedService:
         file_service = FileService(self.db)
 
         upload_data = FileUpload(
-            title=file.filename,
+            title=None,
             description=description,
             access_level="sensitive",  # فایل‌های نیاز حساس هستند
             entity_type="need_ad",
@@ -99,25 +176,45 @@ class NeedService:
             tags=["need_attachment"]
         )
 
-        file_attachment = await file_service.upload_file(
-            file, upload_data, user, encrypt_sensitive=True
-        )
+        # فایل‌ها روی همین session فقط flush می‌شوند و در انتها یک commit انجام می‌شود
+        file_attachments = []
+        stored_paths = []
+        try:
+            for file in files:
+                file_attachment = await file_service.upload_file(
+                    file,
+                    upload_data.model_copy(update={"title": file.filename}),
+                    user,
+                    encrypt_sensitive=True,
+                    commit=False
+                )
+                file_attachments.append(file_attachment)
+                stored_paths.append(file_attachment.storage_path)
+
+            # اضافه کردن به لیست attachments نیاز
+            if need.attachments is None:
+                need.attachments = []
+            need.attachments.extend(
+                {
+                    "file_id": file_attachment.id,
+                    "file_name": file_attachment.original_filename,
+                    "uploaded_by": user.id,
+                    "uploaded_at": file_attachment.uploaded_at.isoformat(),
+                    "description": description
+                }
+                for file_attachment in file_attachments
+            )
+            # تغییر درجای ستون JSON بدون این علامت ذخیره نمی‌شود
+            flag_modified(need, "attachments")
 
-        # اضافه کردن به لیست attachments نیاز
-        current_attachments = need.attachments or []
-        current_attachments.append({
-            "file_id": file_attachment.id,
-            "file_name": file_attachment.original_filename,
-            "uploaded_by": user.id,
-            "uploaded_at": file_attachment.uploaded_at.isoformat(),
-            "description": description
-        })
-
-        need.attachments = current_attachments
-        self.db.add(need)
-        await self.db.commit()
+            await self.db.commit()
+        except Exception:
+            # رکوردهای این دسته برگردانده می‌شوند؛ فایل‌هایی که روی دیسک نوشته شدند هم پاک می‌شوند
+            await self.db.rollback()
+            await file_service.discard_stored_files(stored_paths)
+            raise
 
-        return file_attachment
+        return file_attachments
 
     async def update_need(self, need_id: int, update_data, user: User) -> NeedAd:
         """ویرایش نیاز"""
@@ -141,6 +238,9 @@ class NeedService:
         if need.status == "rejected":
             need.status = "pending"
 
+        # مبلغ هدف و مهلت در امتیاز اعتماد اثر دارند
+        await self.refresh_trust_score(need)
+
         self.db.add(need)
         await self.db.commit()
         await self.db.refresh(need)
@@ -187,17 +287,13 @@ class NeedService:
         self.db.add(need)
         await self.db.commit()
         await self.db.refresh(need)
+        # نیازهای تکمیل‌شده و باز در گزارش‌های مالی شمرده می‌شوند
+        await FinancialReportService.invalidate_cache()
         return need
 
     async def get_need(self, need_id: int, user: Optional[User] = None) -> Dict[str, Any]:
         """دریافت نیاز با کنترل دسترسی"""
-        result = await self.db.execute(
-            select(NeedAd).where(NeedAd.id == need_id)
-        )
-        need = result.scalar_one_or_none()
-
-        if not need:
-            raise HTTPException(status_code=404, detail="Need not found")
+        need = await self._get_need(need_id)
 
         # بررسی سطح دسترسی
         can_view_details = self._check_view_permission(need, user)
@@ -293,99 +389,91 @@ class NeedService:
         return base_data
 
     async def list_needs(
-            self, filters, user: Optional[User] = None, page: int = 1, limit: int = 20
+            self, filters: NeedAdFilter, user: Optional[User] = None, page: int = 1, limit: int = 20
     ) -> Dict[str, Any]:
         """لیست نیازها با فیلتر و صفحه‌بندی"""
-        from schemas.need import NeedAdFilter  # Import در اینجا
-
-        query = select(NeedAd).where(NeedAd.status.in_([
+        # تعداد تأییدیه‌های APPROVED در خود کوئری شمرده می‌شود، نه با بارگذاری ردیف‌ها
+        verification_count = select(func.count(NeedVerification.id)).where(
+            NeedVerification.need_id == NeedAd.id,
+            NeedVerification.status == "approved"
+        ).correlate(NeedAd).scalar_subquery()
+
+        query = select(
+            *_LIST_COLUMNS,
+            verification_count.label("verification_count"),
+            # کل نتایج فیلترشده همراه همان صفحه برمی‌گردد
+            func.count().over().label("total")
+        ).outerjoin(
+            Charity, Charity.id == NeedAd.charity_id
+        ).where(NeedAd.status.in_([
             "approved", "active", "completed"
         ]))
 
         # اعمال فیلترها
-        if hasattr(filters, 'category') and filters.category:
-            query = query.where(NeedAd.category == filters.category)
-        if hasattr(filters, 'city') and filters.city:
-            query = query.where(NeedAd.city.ilike(f"%{filters.city}%"))
-        if hasattr(filters, 'province') and filters.province:
-            query = query.where(NeedAd.province.ilike(f"%{filters.province}%"))
-        if hasattr(filters, 'charity_id') and filters.charity_id:
-            query = query.where(NeedAd.charity_id == filters.charity_id)
-        if hasattr(filters, 'is_urgent') and filters.is_urgent is not None:
-            query = query.where(NeedAd.is_urgent == filters.is_urgent)
-        if hasattr(filters, 'is_emergency') and filters.is_emergency is not None:
-            query = query.where(NeedAd.is_emergency == filters.is_emergency)
-        if hasattr(filters, 'min_amount') and filters.min_amount:
-            query = query.where(NeedAd.target_amount >= filters.min_amount)
-        if hasattr(filters, 'max_amount') and filters.max_amount:
-            query = query.where(NeedAd.target_amount <= filters.max_amount)
-        if hasattr(filters, 'search_text') and filters.search_text:
+        for field, op, column in _LIST_FILTERS:
+            value = getattr(filters, field)
+            if value is not None and value != "":
+                query = query.where(op(column, value))
+        if filters.search_text:
+            query = query.where(_search_condition(filters.search_text))
+        if filters.verified_only:
+            # نیازهایی که حداقل یک تأییدیه APPROVED دارند
             query = query.where(
-                or_(
-                    NeedAd.title.ilike(f"%{filters.search_text}%"),
-                    NeedAd.short_description.ilike(f"%{filters.search_text}%"),
-                    NeedAd.description.ilike(f"%{filters.search_text}%")
+                exists().where(
+                    NeedVerification.need_id == NeedAd.id,
+                    NeedVerification.status == "approved"
                 )
             )
-        if hasattr(filters, 'verified_only') and filters.verified_only:
-            # نیازهایی که حداقل یک تأییدیه APPROVED دارند
-            subquery = select(NeedVerification.need_id).where(
-                NeedVerification.status == "approved"
-            ).distinct()
-            query = query.where(NeedAd.id.in_(subquery))
 
         # مرتب‌سازی
-        sort_by = getattr(filters, 'sort_by', 'created_at')
-        sort_order = getattr(filters, 'sort_order', 'desc')
-
-        sort_column = getattr(NeedAd, sort_by, NeedAd.created_at)
-        if sort_order == "desc":
-            query = query.order_by(sort_column.desc())
-        else:
-            query = query.order_by(sort_column.asc())
+        sort_orders = _SORT_ORDERS.get(filters.sort_by, _SORT_ORDERS["created_at"])
+        query = query.order_by(sort_orders["desc" if filters.sort_order == "desc" else "asc"])
 
         # صفحه‌بندی
-        total_query = select(func.count()).select_from(query.subquery())
-        total = await self.db.scalar(total_query)
-
         offset = (page - 1) * limit
         query = query.offset(offset).limit(limit)
 
         # اجرای کوئری
         result = await self.db.execute(query)
-        needs = result.scalars().all()
+        rows = result.mappings().all()
+
+        if rows:
+            total = rows[0]["total"]
+        elif page > 1:
+            # صفحه خارج از محدوده؛ شمارش کل فقط در این حالت جداگانه گرفته می‌شود
+            total = await self.db.scalar(
+                select(func.count()).select_from(query.limit(None).offset(None).subquery())
+            )
+        else:
+            total = 0
 
         # تبدیل به فرمت خروجی
         need_list = []
-        for need in needs:
+        for row in rows:
+            target_amount = row["target_amount"]
+            collected_amount = row["collected_amount"] or 0
             # محاسبه پیشرفت
-            progress = (need.collected_amount / need.target_amount * 100) if need.target_amount > 0 else 0
-
-            # شمارش تأییدیه‌های APPROVED
-            verification_count = 0
-            if hasattr(need, 'verifications'):
-                verification_count = len([v for v in need.verifications
-                                          if hasattr(v, 'status') and v.status == "approved"])
+            progress = (collected_amount / target_amount * 100) if target_amount > 0 else 0
 
             need_list.append({
-                "id": need.id,
-                "uuid": need.uuid,
-                "title": need.title,
-                "short_description": need.short_description,
-                "category": need.category,
-                "target_amount": need.target_amount,
-                "collected_amount": need.collected_amount or 0,
-                "currency": need.currency,
-                "status": need.status,
-                "is_urgent": need.is_urgent or False,
-                "is_emergency": need.is_emergency or False,
-                "city": need.city,
-                "province": need.province,
-                "charity_id": need.charity_id,
-                "charity_name": need.charity.name if need.charity else None,
-                "created_at": need.created_at,
+                "id": row["id"],
+                "uuid": row["uuid"],
+                "title": row["title"],
+                "short_description": row["short_description"],
+                "category": row["category"],
+                "target_amount": target_amount,
+                "collected_amount": collected_amount,
+                "currency": row["currency"],
+                "status": row["status"],
+                "is_urgent": row["is_urgent"] or False,
+                "is_emergency": row["is_emergency"] or False,
+                "city": row["city"],
+                "province": row["province"],
+                "charity_id": row["charity_id"],
+                "charity_name": row["charity_name"],
+                "created_at": row["created_at"],
                 "progress_percentage": round(progress, 2),
-                "verification_count": verification_count
+                "verification_count": row["verification_count"] or 0
             })
 
         return {
@@ -400,28 +488,37 @@ class NeedService:
             self, need_id: int, charity_id: int, user: User, comment: Optional[str] = None
     ) -> NeedVerification:
         """اضافه کردن تأییدیه به نیاز"""
-        need = await self._get_need(need_id)
+        # وجود نیاز، وجود خیریه و تأییدیه تکراری در یک رفت‌وبرگشت
+        row = (await self.db.execute(
+            select(
+                NeedAd.id.label("need_id"),
+                Charity.id.label("charity_id"),
+                Charity.manager_id,
+                NeedVerification.id.label("verification_id")
+            ).select_from(NeedAd).outerjoin(
+                Charity, Charity.id == charity_id
+            ).outerjoin(
+                NeedVerification,
+                and_(
+                    NeedVerification.need_id == NeedAd.id,
+                    NeedVerification.charity_id == charity_id
+                )
+            ).where(NeedAd.id == need_id)
+        )).first()
+
+        if row is None:
+            raise HTTPException(status_code=404, detail="Need not found")
 
         # بررسی اینکه آیا خیریه مجاز به تأیید است
-        charity = await self.db.get(Charity, charity_id)
-        if not charity:
+        if row.charity_id is None:
             raise HTTPException(status_code=404, detail="Charity not found")
 
         # بررسی اینکه کاربر مدیر این خیریه است یا ادمین
-        user_roles = [r.key for r in user.roles]
-        if charity.manager_id != user.id and "ADMIN" not in user_roles:
+        if row.manager_id != user.id and "ADMIN" not in user.role_keys:
             raise HTTPException(status_code=403, detail="Not authorized to verify")
 
         # بررسی تأییدیه تکراری
-        existing = await self.db.execute(
-            select(NeedVerification).where(
-                and_(
-                    NeedVerification.need_id == need_id,
-                    NeedVerification.charity_id == charity_id
-                )
-            )
-        )
-        if existing.scalar_one_or_none():
+        if row.verification_id is not None:
             raise HTTPException(status_code=400, detail="Already verified by this charity")
 
         # ایجاد تأییدیه
@@ -463,24 +560,87 @@ class NeedService:
             need.verified_at = datetime.utcnow()
             need.verified_by = user.id  # اختیاری
 
-            # اختیاری: محاسبه اولیه trust_score
-            need.trust_score = await self._calculate_trust_score(need.id)
-
             # نوتیفیکیشن به نیازمند (بعداً پیاده‌سازی شود)
             # await send_notification(need.needy_user, "نیاز شما تأیید و منتشر شد")
 
         # ───────────────────────────────────────────────────────────────────────────────────────
 
+        # امتیاز اعتماد هنگام نوشتن محاسبه می‌شود تا مسیرهای خواندن فقط ستون را بخوانند
+        await self.refresh_trust_score(need)
+
         await self.db.commit()
         await self.db.refresh(verification)
         await self.db.refresh(need)  # مهم!
         return verification
 
+    async def refresh_trust_score(self, need: NeedAd) -> float:
+        """بازمحاسبه امتیاز اعتماد و ذخیره آن در need.trust_score (commit با فراخواننده)"""
+        approved_verifications, charity_verified = (await self.db.execute(
+            select(
+                select(func.count(NeedVerification.id)).where(
+                    NeedVerification.need_id == need.id,
+                    NeedVerification.status == "approved"
+                ).scalar_subquery(),
+                select(Charity.verified).where(
+                    Charity.id == need.charity_id
+                ).scalar_subquery()
+            )
+        )).one()
+        score = 0.0
+
+        # 1. تأییدیه‌های خیریه (40 امتیاز)
+        score += min(approved_verifications * 10, 40)  # هر تأییدیه 10 امتیاز
+
+        # 2. درصد تکمیل (30 امتیاز)
+        if need.target_amount > 0:
+            progress = (need.collected_amount or 0) / need.target_amount
+            score += progress * 30
+
+        # 3. زمان باقی‌مانده (10 امتیاز)
+        if need.deadline:
+            days_left = (need.deadline - datetime.utcnow()).days
+            if days_left > 30:
+                score += 10
+            elif days_left > 14:
+                score += 7
+            elif days_left > 7:
+                score += 5
+            elif days_left > 3:
+                score += 3
+            elif days_left > 0:
+                score += 1
+
+        # 4. خیریه تأیید شده (20 امتیاز)
+        if charity_verified:
+            score += 20
+
+        need.trust_score = round(score, 2)
+        return need.trust_score
+
+    async def refresh_all_trust_scores(self, batch_size: int = 500) -> int:
+        """بازمحاسبه امتیاز اعتماد همه نیازها به صورت دسته‌ای؛ هر دسته جداگانه commit می‌شود"""
+        refreshed = 0
+        last_id = 0
+        while True:
+            needs = (await self.db.execute(
+                select(NeedAd).where(NeedAd.id > last_id).order_by(NeedAd.id).limit(batch_size)
+            )).scalars().all()
+            if not needs:
+                return refreshed
+
+            for need in needs:
+                await self.refresh_trust_score(need)
+            await self.db.commit()
+
+            refreshed += len(needs)
+            last_id = needs[-1].id
+
     # ---------- Helper Methods ----------
     async def _get_need(self, need_id: int) -> NeedAd:
         """دریافت نیاز با بررسی وجود"""
+        # ساخت عبارت یک بار کش می‌شود و فقط need_id به عنوان پارامتر عوض می‌شود
         result = await self.db.execute(
-            select(NeedAd).where(NeedAd.id == need_id)
+            lambda_stmt(lambda: select(NeedAd).where(NeedAd.id == need_id))
         )
         need = result.scalar_one_or_none()
         if not need:
@@ -492,19 +652,16 @@ class NeedService:
     ) -> NeedAd:
         """دریافت نیاز با بررسی مجوز"""
         need = await self._get_need(need_id)
-        user_roles = [r.key for r in user.roles]
+        is_manager = not user.role_keys.isdisjoint(_MANAGER_ROLES)
 
         if require_admin:
-            if "ADMIN" not in user_roles and \
-                    "CHARITY_MANAGER" not in user_roles and \
-                    need.charity.manager_id != user.id:
+            if not is_manager and need.charity.manager_id != user.id:
                 raise HTTPException(status_code=403, detail="Not authorized")
         else:
             # بررسی مالکیت یا دسترسی مدیر
             if need.created_by_id != user.id and \
                     need.charity.manager_id != user.id and \
-                    "ADMIN" not in user_roles and \
-                    "CHARITY_MANAGER" not in user_roles:
+                    not is_manager:
                 raise HTTPException(status_code=403, detail="Not authorized")
 
         return need
@@ -514,10 +671,18 @@ class NeedService:
         if not user:
             return need.privacy_level == "public"
 
-        user_roles = [r.key for r in user.roles]
+        key = (
+            user.id, need.id, need.privacy_level,
+            need.charity_id, need.created_by_id, need.needy_user_id
+        )
+        if key not in self._perm_cache:
+            self._perm_cache[key] = self._evaluate_view_permission(need, user)
+        return self._perm_cache[key]
 
+    def _evaluate_view_permission(self, need: NeedAd, user: User) -> bool:
+        """محاسبه مجوز مشاهده جزئیات برای کاربر واردشده"""
         # ادمین/مدیر همیشه دسترسی دارد
-        if "ADMIN" in user_roles or "CHARITY_MANAGER" in user_roles:
+        if not user.role_keys.isdisjoint(_MANAGER_ROLES):
             return True
 
         # مدیر خیریه مربوطه
@@ -546,11 +711,8 @@ class NeedService:
         if not user:
             return False
 
-        user_roles = [r.key for r in user.roles]
-
         # فقط کاربران خاص مجازند
-        allowed_roles = {"ADMIN", "CHARITY_MANAGER", "CHARITY", "DONOR"}
-        if not any(role in allowed_roles for role in user_roles):
+        if user.role_keys.isdisjoint(_ATTACHMENT_VIEWER_ROLES):
             return False
 
         # کاربر باید تأیید شده باشد
@@ -622,9 +784,12 @@ async def update_need_progress(
         "notes": notes
     })
 
+    await self.refresh_trust_score(need)
+
     self.db.add(need)
     await self.db.commit()
     await self.db.refresh(need)
+    await FinancialReportService.invalidate_cache()
 
     return need
 
@@ -677,8 +842,9 @@ async def get_need_with_verified_badges(self, need_id: int, user: Optional[User]
 
     need_data = await self.get_need(need_id, user)
 
-    # محاسبه امتیاز اعتماد
-    trust_score = await self._calculate_trust_score(need_id)
+    # امتیاز اعتماد ذخیره‌شده؛ نیاز از get_need در identity map session است
+    need = await self.db.get(NeedAd, need_id)
+    trust_score = need.trust_score or 0.0
     need_data["trust_score"] = trust_score
 
     # تعیین سطح نشان اعتماد
@@ -783,20 +949,23 @@ async def increment_social_share(self, need_id: int, platform: str, user_id: int
     if db is None:
         db = self.db
 
-    share = NeedSocialShare(
-        need_id=need_id,
-        platform=platform,
-        user_id=user_id
-    )
-    db.add(share)
-    await db.commit()
-
-    # شمارش کل اشتراک‌ها برای این نیاز و پلتفرم
-    count_query = select(func.count()).where(
+    shares = select(func.count()).where(
         NeedSocialShare.need_id == need_id,
         NeedSocialShare.platform == platform
+    ).scalar_subquery()
+    # در PostgreSQL زیرکوئری snapshot پیش از درج را می‌بیند و ردیف جدید با +1 حساب می‌شود؛
+    # در SQLite ردیف درج‌شده خودش در شمارش هست
+    if IS_POSTGRESQL:
+        shares = shares + 1
+
+    total = await db.scalar(
+        insert(NeedSocialShare).values(
+            need_id=need_id,
+            platform=platform,
+            user_id=user_id
+        ).returning(shares)
     )
-    total = await db.scalar(count_query)
+    await db.commit()
     return {"platform": platform, "share_count": total}
 
 
@@ -886,42 +1055,6 @@ async def get_need_statistics(self, need_id: int) -> Dict[str, Any]:
 
 # ========== متدهای کمکی جدید ==========
 
-async def _calculate_trust_score(self, need_id: int) -> float:
-    """محاسبه امتیاز اعتماد برای نیاز"""
-
-    need = await self._get_need(need_id)
-    score = 0.0
-
-    # 1. تأییدیه‌های خیریه (40 امتیاز)
-    approved_verifications = len([v for v in need.verifications if v.status == "approved"])
-    score += min(approved_verifications * 10, 40)  # هر تأییدیه 10 امتیاز
-
-    # 2. درصد تکمیل (30 امتیاز)
-    if need.target_amount > 0:
-        progress = (need.collected_amount or 0) / need.target_amount
-        score += progress * 30
-
-    # 3. زمان باقی‌مانده (10 امتیاز)
-    if need.deadline:
-        days_left = (need.deadline - datetime.utcnow()).days
-        if days_left > 30:
-            score += 10
-        elif days_left > 14:
-            score += 7
-        elif days_left > 7:
-            score += 5
-        elif days_left > 3:
-            score += 3
-        elif days_left > 0:
-            score += 1
-
-    # 4. خیریه تأیید شده (20 امتیاز)
-    if need.charity and need.charity.verified:
-        score += 20
-
-    return round(score, 2)
-
-
 async def _get_verified_by_list(self, need_id: int) -> List[Dict[str, Any]]:
     """دریافت لیست تأییدکنندگان با نشان"""
 
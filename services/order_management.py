@@ -12,6 +12,9 @@ from models.product import Product
 from models.user import User
 from models.charity import Charity
 from models.need_ad import NeedAd
+from services.financial_report import FinancialReportService
+from services.impact_report_service import ImpactReportService
+from services.need_service import NeedService
 from schemas.order import (
     CartCreate, CartUpdate, CartItemCreate, CartItemUpdate, OrderCreate,
     OrderUpdate, OrderStatusUpdate, PaymentStatusUpdate, OrderFilter,
@@ -417,6 +420,11 @@ class OrderService:
             {"from": old_status, "to": status_data.status, "notes": status_data.notes}
         )
 
+        # سهم خیریه از سفارش در گزارش‌های مالی و در صورت اتصال به نیاز در گزارش تأثیر اثر دارد
+        await FinancialReportService.invalidate_cache()
+        if order.need_id:
+            await ImpactReportService.invalidate_cache()
+
         return order
 
     async def update_payment_status(self, order_id: int, status_data: PaymentStatusUpdate, user: User) -> Order:
@@ -455,6 +463,11 @@ class OrderService:
             {"from": old_status, "to": status_data.status, "transaction_id": status_data.transaction_id}
         )
 
+        # سهم خیریه از سفارش در گزارش‌های مالی و در صورت اتصال به نیاز در گزارش تأثیر اثر دارد
+        await FinancialReportService.invalidate_cache()
+        if order.need_id:
+            await ImpactReportService.invalidate_cache()
+
         return order
 
     async def cancel_order(self, order_id: int, user: User, reason: Optional[str] = None) -> Order:
@@ -491,6 +504,11 @@ class OrderService:
             {"reason": reason, "previous_status": old_status}
         )
 
+        # سهم خیریه از سفارش در گزارش‌های مالی و در صورت اتصال به نیاز در گزارش تأثیر اثر دارد
+        await FinancialReportService.invalidate_cache()
+        if order.need_id:
+            await ImpactReportService.invalidate_cache()
+
         return order
 
     async def list_orders(
@@ -1096,6 +1114,7 @@ class OrderService:
                 need = await self.db.get(NeedAd, order.need_id)
                 if need:
                     need.collected_amount = (need.collected_amount or 0) + order.charity_amount
+                    await NeedService(self.db).refresh_trust_score(need)
                     self.db.add(need)
 
     async def _validate_coupon(self, code: str, cart: Cart, customer_id: Optional[int] = None) -> Optional[Coupon]:
@@ -0,0 +1,48 @@
+# tests/test_file_service.py
+import asyncio
+from types import SimpleNamespace
+
+from sqlalchemy.sql import visitors
+from sqlalchemy.sql.elements import BindParameter
+
+from schemas.file import FileFilter
+from services.file_service import FileService
+
+
+class _RecordingSession:
+    """session ساختگی که کوئری‌ها و پارامترهای اجراشده را نگه می‌دارد"""
+
+    def __init__(self):
+        self.executed = []
+
+    async def execute(self, statement, params=None):
+        self.executed.append((statement, params))
+        return SimpleNamespace(all=lambda: [])
+
+
+def _user(*roles):
+    return SimpleNamespace(id=7, role_keys=frozenset(roles))
+
+
+def test_list_files_as_non_admin_binds_user_id():
+    db = _RecordingSession()
+    service = FileService(db)
+
+    result = asyncio.run(service.list_files(FileFilter(search_text="report"), _user("DONOR")))
+
+    assert result["items"] == []
+    assert result["total"] == 0
+    statement, params = db.executed[0]
+    assert params == {"search_text": "%report%", "user_id": 7}
+    # نام پارامترها بدون compile (که mapperها را پیکربندی می‌کند) از خود دستور خوانده می‌شود
+    bound = {element.key for element in visitors.iterate(statement) if isinstance(element, BindParameter)}
+    assert {"search_text", "user_id"} <= bound
+
+
+def test_list_files_as_needy_user():
+    db = _RecordingSession()
+
+    asyncio.run(FileService(db).list_files(FileFilter(), _user("NEEDY")))
+
+    _, params = db.executed[0]
+    assert params == {"user_id": 7}
@@ -0,0 +1,254 @@
+# utils/xlsx_writer.py
+import math
+import re
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from xml.sax.saxutils import escape
+
+# کاراکترهای کنترلی که در XML مجاز نیستند
+_ILLEGAL_XML_CHARS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+# کاراکترهایی که اکسل در نام شیت نمی‌پذیرد
+_INVALID_SHEET_CHARS = re.compile(r"[\\*?:/\[\]]")
+
+_MAX_SHEET_NAME = 31
+
+# مبدأ شماره سریال تاریخ در اکسل (با احتساب باگ سال کبیسه ۱۹۰۰)
+_EXCEL_EPOCH = datetime(1899, 12, 30)
+
+_CONTENT_TYPES_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '<Override PartName="/xl/sharedStrings.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/>'
+)
+
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+
+_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<numFmts count="3"><numFmt numFmtId="164" formatCode="0.0&quot;%&quot;"/>'
+    '<numFmt numFmtId="165" formatCode="yyyy-mm-dd"/>'
+    '<numFmt numFmtId="166" formatCode="yyyy-mm-dd h:mm:ss"/></numFmts>'
+    '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="5">'
+    '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="3" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="165" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="166" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '</cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+
+_SHEET_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<sheetData>'
+)
+
+_SHEET_TAIL = '</sheetData></worksheet>'
+
+# اندیس cellXfs در styles.xml برای هر format ستون؛ هر استایل یک بار تعریف و بین سلول‌ها مشترک است
+_STYLE_ATTRS = {
+    "currency": ' s="1"',
+    "percentage": ' s="2"',
+}
+
+_DATE_STYLE = ' s="3"'
+_DATETIME_STYLE = ' s="4"'
+
+# یک شیت: (نام، سرستون‌ها، سطرها، format ستون‌ها)
+SheetSpec = Tuple[str, Sequence[str], Iterable[Sequence[Any]], Optional[Sequence[Optional[str]]]]
+
+
+def _column_letter(index: int) -> str:
+    """تبدیل شماره ستون (از صفر) به حروف اکسل: 0 -> A ، 26 -> AA"""
+    letters = ""
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def _clean_text(value: str) -> str:
+    return escape(_ILLEGAL_XML_CHARS.sub("", value), {'"': "&quot;"})
+
+
+def _excel_serial(value: date) -> float:
+    """تبدیل date/datetime به شماره سریال اکسل؛ منطقه زمانی مانند pandas کنار گذاشته می‌شود"""
+    if isinstance(value, datetime):
+        delta = value.replace(tzinfo=None) - _EXCEL_EPOCH
+        return delta.days + delta.seconds / 86400 + delta.microseconds / 86400_000_000
+    return float((value - _EXCEL_EPOCH.date()).days)
+
+
+def _sheet_name(name: Any, used: set, sheet_no: int) -> str:
+    """
+    نام معتبر و یکتای شیت: حذف کاراکترهای غیرمجاز، حداکثر ۳۱ کاراکتر،
+    و مانند openpyxl افزودن شماره به نام تکراری (مقایسه بدون حساسیت به حروف)
+    """
+    base = _INVALID_SHEET_CHARS.sub("_", _ILLEGAL_XML_CHARS.sub("", str(name or ""))).strip("'")
+    base = base[:_MAX_SHEET_NAME] or f"Sheet{sheet_no}"
+    candidate = base
+    counter = 1
+    while candidate.lower() in used:
+        suffix = str(counter)
+        candidate = base[:_MAX_SHEET_NAME - len(suffix)] + suffix
+        counter += 1
+    used.add(candidate.lower())
+    return candidate
+
+
+class _SharedStrings:
+    """جدول رشته‌های مشترک؛ هر رشته یکتا فقط یک بار در فایل نوشته می‌شود"""
+
+    def __init__(self):
+        self.index: Dict[str, int] = {}
+        self.count = 0
+
+    def get(self, value: str) -> int:
+        self.count += 1
+        sid = self.index.get(value)
+        if sid is None:
+            sid = self.index[value] = len(self.index)
+        return sid
+
+    def to_xml(self) -> str:
+        items = "".join(f"<si><t xml:space=\"preserve\">{_clean_text(s)}</t></si>" for s in self.index)
+        return (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            f'count="{self.count}" uniqueCount="{len(self.index)}">{items}</sst>'
+        )
+
+
+def _cell_xml(ref: str, value: Any, strings: _SharedStrings, style: str = "") -> str:
+    if value is None or value == "":
+        return ""
+    if isinstance(value, bool):
+        return f'<c r="{ref}" t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, int) or (isinstance(value, float) and math.isfinite(value)):
+        return f'<c r="{ref}"{style}><v>{value}</v></c>'
+    if isinstance(value, Decimal) and value.is_finite():
+        return f'<c r="{ref}"{style}><v>{value}</v></c>'
+    if isinstance(value, date):
+        date_style = _DATETIME_STYLE if isinstance(value, datetime) else _DATE_STYLE
+        return f'<c r="{ref}"{date_style}><v>{_excel_serial(value)}</v></c>'
+    return f'<c r="{ref}" t="s"><v>{strings.get(str(value))}</v></c>'
+
+
+def _row_xml(
+        row_number: int,
+        values: Sequence[Any],
+        letters: List[str],
+        strings: _SharedStrings,
+        styles: Sequence[str] = ()
+) -> str:
+    cells = "".join(
+        _cell_xml(f"{letters[i]}{row_number}", value, strings, styles[i] if i < len(styles) else "")
+        for i, value in enumerate(values)
+    )
+    return f'<row r="{row_number}">{cells}</row>'
+
+
+def write_xlsx(filepath: str, sheets: Iterable[SheetSpec], compresslevel: int = 1) -> int:
+    """
+    نوشتن مستقیم فایل XLSX با تولید XML و فشرده‌سازی zip، بدون openpyxl/xlsxwriter.
+    سطرها به‌صورت جریانی در فایل نوشته می‌شوند.
+    compresslevel پایین (۱) حجم را کمی بیشتر ولی فشرده‌سازی را چند برابر سریع‌تر می‌کند.
+    خروجی: حجم فایل نوشته‌شده به بایت
+    """
+    strings = _SharedStrings()
+    sheet_names: List[str] = []
+    used_names: set = set()
+
+    with open(filepath, "wb") as fh:
+        with zipfile.ZipFile(fh, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=compresslevel) as zf:
+            for name, headers, rows, formats in sheets:
+                sheet_no = len(sheet_names) + 1
+                sheet_names.append(_sheet_name(name, used_names, sheet_no))
+                letters = [_column_letter(i) for i in range(len(headers))]
+                styles = [_STYLE_ATTRS.get(fmt, "") for fmt in (formats or ())]
+
+                with zf.open(f"xl/worksheets/sheet{sheet_no}.xml", "w", force_zip64=True) as part:
+                    part.write(_SHEET_HEAD.encode("utf-8"))
+                    part.write(_row_xml(1, headers, letters, strings).encode("utf-8"))
+                    for row_number, values in enumerate(rows, 2):
+                        if len(values) > len(letters):
+                            letters.extend(_column_letter(i) for i in range(len(letters), len(values)))
+                        part.write(_row_xml(row_number, values, letters, strings, styles).encode("utf-8"))
+                    part.write(_SHEET_TAIL.encode("utf-8"))
+
+            if not sheet_names:
+                # اکسل فایل بدون شیت را باز نمی‌کند
+                sheet_names.append("Sheet1")
+                zf.writestr("xl/worksheets/sheet1.xml", _SHEET_HEAD + _SHEET_TAIL)
+
+            sheet_overrides = "".join(
+                f'<Override PartName="/xl/worksheets/sheet{i}.xml" '
+                'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+                for i in range(1, len(sheet_names) + 1)
+            )
+            zf.writestr("[Content_Types].xml", _CONTENT_TYPES_HEAD + sheet_overrides + "</Types>")
+            zf.writestr("_rels/.rels", _ROOT_RELS)
+
+            sheets_xml = "".join(
+                f'<sheet name="{_clean_text(name)}" sheetId="{i}" r:id="rId{i}"/>'
+                for i, name in enumerate(sheet_names, 1)
+            )
+            zf.writestr(
+                "xl/workbook.xml",
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+                'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+                f'<sheets>{sheets_xml}</sheets></workbook>'
+            )
+
+            rels = "".join(
+                f'<Relationship Id="rId{i}" '
+                'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+                f'Target="worksheets/sheet{i}.xml"/>'
+                for i in range(1, len(sheet_names) + 1)
+            )
+            n = len(sheet_names)
+            rels += (
+                f'<Relationship Id="rId{n + 1}" '
+                'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+                'Target="styles.xml"/>'
+                f'<Relationship Id="rId{n + 2}" '
+                'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/sharedStrings" '
+                'Target="sharedStrings.xml"/>'
+            )
+            zf.writestr(
+                "xl/_rels/workbook.xml.rels",
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+                f'{rels}</Relationships>'
+            )
+            zf.writestr("xl/styles.xml", _STYLES)
+            zf.writestr("xl/sharedStrings.xml", strings.to_xml())
+
+        return fh.tell()